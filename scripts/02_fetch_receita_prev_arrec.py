@@ -19,16 +19,21 @@ Requisitos: requests
 """
 
 import argparse
+import itertools
+import os
 import random
+import shutil
 import sys
 import time
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
 
 BASE = "http://portaltransparencia.londrina.pr.gov.br:8080"
-URL_PROCESS = f"{BASE}/transparencia/execucaoOrcamentariaAnexo10ComparativoDaReceitaPrevistaComArrecadada/process"
+URL_FORM = f"{BASE}/transparencia/execucaoOrcamentariaAnexo10ComparativoDaReceitaPrevistaComArrecadada"
+URL_PROCESS = f"{URL_FORM}/process"
 
 # Lista padrão (todas)
 ENTIDADES_DEFAULT: List[Tuple[int, str, str]] = [
@@ -97,23 +102,49 @@ def looks_like_pdf(content: bytes, content_type: str) -> bool:
     return ("application/pdf" in ct) or ("octet-stream" in ct and not is_html(content))
 
 
-def download_year(year: int, out_dir: Path, timeout: int, retries: int, backoff: float, entidades_arg: Optional[str], verbose: bool) -> bool:
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/139.0.0.0 Safari/537.36"
+
+
+def make_session(verbose: bool = False) -> requests.Session:
+    """
+    Session única para todos os anos: keep-alive (sem 'Connection: close') e pool de conexões,
+    então cada ano reaproveita a conexão TCP. Aquece os cookies no formulário uma vez.
+    """
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    try:
+        s.get(URL_FORM, headers={"User-Agent": USER_AGENT}, timeout=30)
+    except Exception as e:
+        if verbose:
+            print(f"⚠️ warm-up da sessão falhou ({e}); seguindo com o POST.")
+    return s
+
+
+def download_year(year: int, out_dir: Path, timeout: int, retries: int, backoff: float, entidades_arg: Optional[str], verbose: bool,
+                  session: Optional[requests.Session] = None) -> bool:
+    if session is None:
+        # sessão própria: fecha o pool de conexões ao terminar
+        with make_session(verbose) as s:
+            return download_year(year, out_dir, timeout, retries, backoff, entidades_arg, verbose, session=s)
+
     entidades = parse_entities_arg(entidades_arg)
     payload = build_payload(year, entidades)
 
-    s = requests.Session()
+    s = session
     headers = {
         "Content-Type": "application/x-www-form-urlencoded",
         "Origin": BASE,
-        "Referer": f"{BASE}/transparencia/execucaoOrcamentariaAnexo10ComparativoDaReceitaPrevistaComArrecadada",
-        "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/139.0.0.0 Safari/537.36",
+        "Referer": URL_FORM,
+        "User-Agent": USER_AGENT,
         "Accept": "application/pdf,application/octet-stream,*/*;q=0.8",
         "Accept-Language": "pt-BR,pt;q=0.9,en-US;q=0.7,en;q=0.5",
-        "Connection": "close",
     }
 
     out_dir.mkdir(parents=True, exist_ok=True)
     out_pdf = out_dir / f"{year}-12-31_anexo10_prev_arrec.pdf"
+    tmp_pdf = out_pdf.with_suffix(".pdf.part")
     debug_dir = out_dir / "_html_debug"
     debug_dir.mkdir(parents=True, exist_ok=True)
 
@@ -122,26 +153,35 @@ def download_year(year: int, out_dir: Path, timeout: int, retries: int, backoff:
         try:
             if verbose:
                 print(f"→ {year}: tentativa {attempt}/{retries}…")
-            r = s.post(URL_PROCESS, data=payload, headers=headers, timeout=timeout)
-            content = r.content or b""
-            ctype = r.headers.get("Content-Type", "")
-
-            if is_html(content):
-                dbg = debug_dir / f"{year}_attempt{attempt}.html"
-                dbg.write_bytes(content)
-                raise RuntimeError(f"Servidor retornou HTML (sessão/params). Debug: {dbg}")
-
-            if not looks_like_pdf(content, ctype):
+            # stream=True: inspeciona o 1º bloco e aborta sem baixar o corpo inteiro se vier HTML;
+            # o resto vai direto para um .part em disco (memória limitada a um bloco)
+            size = 0
+            with s.post(URL_PROCESS, data=payload, headers=headers, timeout=timeout, stream=True) as r:
+                ctype = r.headers.get("Content-Type", "")
+                chunks = r.iter_content(chunk_size=1 << 20)
+                first = next(chunks, b"")
+                if is_html(first):
+                    dbg = debug_dir / f"{year}_attempt{attempt}.html"
+                    dbg.write_bytes(first)
+                    raise RuntimeError(f"Servidor retornou HTML (sessão/params). Debug: {dbg}")
+                with open(tmp_pdf, "wb") as fh:
+                    for chunk in itertools.chain((first,), chunks):
+                        fh.write(chunk)
+                        size += len(chunk)
+
+            if not looks_like_pdf(first, ctype):
                 dbg = debug_dir / f"{year}_attempt{attempt}_nao_pdf.bin"
-                dbg.write_bytes(content)
+                shutil.copyfile(tmp_pdf, dbg)
                 print(f"⚠️ {year}: conteúdo não parece PDF; salvando assim mesmo (parser pode falhar).")
 
-            out_pdf.write_bytes(content)
+            # rename atômico: um download interrompido nunca deixa PDF truncado no destino
+            os.replace(tmp_pdf, out_pdf)
             if verbose:
-                print(f"✅ {year}: salvo {out_pdf} ({len(content)} bytes)")
+                print(f"✅ {year}: salvo {out_pdf} ({size} bytes)")
             return True
 
         except Exception as e:
+            tmp_pdf.unlink(missing_ok=True)
             last_err = e
             print(f"⚠️ {year}: tentativa {attempt}/{retries} falhou: {e}")
             sleep_s = max(1.5, backoff * attempt) + random.uniform(0, 1.2)
@@ -155,19 +195,21 @@ def cmd_download(args) -> None:
     years = parse_anos(args.anos)
     out_dir = Path(args.saida)
     ok_all = True
-    for y in years:
-        ok = download_year(
-            year=y,
-            out_dir=out_dir,
-            timeout=args.timeout,
-            retries=args.retries,
-            backoff=args.backoff,
-            entidades_arg=args.entities,
-            verbose=args.verbose,
-        )
-        ok_all = ok_all and ok
-        # pequena pausa entre anos para aliviar o servidor
-        time.sleep(1.5)
+    with make_session(args.verbose) as sess:
+        for y in years:
+            ok = download_year(
+                year=y,
+                out_dir=out_dir,
+                timeout=args.timeout,
+                retries=args.retries,
+                backoff=args.backoff,
+                entidades_arg=args.entities,
+                verbose=args.verbose,
+                session=sess,
+            )
+            ok_all = ok_all and ok
+            # pequena pausa entre anos para aliviar o servidor
+            time.sleep(1.5)
     if not ok_all:
         sys.exit(2)
 
@@ -17,6 +17,7 @@ CLI:
 - Aceita --in (pasta) ou --pdf (glob/arquivo). Um dos dois é obrigatório.
 - Para saída, use --outdir (um CSV por PDF). Opcionalmente, --ptbr para CSV com ; e vírgula decimal.
 - Também funciona no modo "concat" com --out (CSV único), se preferir.
+- Com --outdir, --incremental pula PDFs cujo CSV de saída já existe e é mais novo que o PDF.
 
 Exemplos:
   # Vários PDFs em raw/receitas_raw -> CSV por ano em raw/receitas
@@ -166,13 +167,22 @@ def extract_table_from_pdf(pdf_path: Path, verbose: bool = False) -> pd.DataFram
     frames: List[pd.DataFrame] = []
 
     with pdfplumber.open(str(pdf_path)) as pdf:
+        empty_streak = 0
         for pageno, page in enumerate(pdf.pages, start=1):
             txt = page.extract_text(x_tolerance=1, y_tolerance=1) or ""
-            lines = [ln for ln in txt.splitlines() if ln and ln.strip()]
+            lines = txt.split("\n")  # linhas vazias são descartadas em parse_table_lines
             df_page = parse_table_lines(lines)
             if verbose:
                 log(f"   · página {pageno}: {'ok' if not df_page.empty else 'vazia'} ({len(lines)} linhas)")
-            if not df_page.empty:
+            if df_page.empty:
+                empty_streak += 1
+                # tabela já encontrada e 2 páginas seguidas sem linhas → fim da tabela
+                if frames and empty_streak >= 2:
+                    if verbose:
+                        log(f"   · fim da tabela na página {pageno - 1}; ignorando páginas restantes")
+                    break
+            else:
+                empty_streak = 0
                 frames.append(df_page)
 
     if not frames:
@@ -182,16 +192,12 @@ def extract_table_from_pdf(pdf_path: Path, verbose: bool = False) -> pd.DataFram
 
     df = pd.concat(frames, ignore_index=True)
 
-    # limpeza final defensiva
-    def _up(series: pd.Series) -> pd.Series:
-        return series.astype(str).str.strip().str.upper()
-
-    mask_total = _up(df.get("codigo", pd.Series("", index=df.index))).eq("TOTAL") \
-               | _up(df.get("especificacao", pd.Series("", index=df.index))).eq("TOTAL")
-    df = df.loc[~mask_total].copy()
-
+    # limpeza final defensiva (parse_table_lines já emite str → sem astype/cópia)
     for c in ("codigo","especificacao","subitem"):
-        df[c] = df[c].astype(str).str.strip()
+        df[c] = df[c].str.strip()
+
+    mask_total = df["codigo"].str.upper().eq("TOTAL") | df["especificacao"].str.upper().eq("TOTAL")
+    df = df[~mask_total]
 
     df = df.drop_duplicates(subset=["codigo","especificacao","subitem","previsao","arrecadacao","para_mais","para_menos"])
     df = df[["codigo","especificacao","subitem","previsao","arrecadacao","para_mais","para_menos"]]
@@ -230,6 +236,8 @@ def main():
     ap.add_argument("--ptbr", action="store_true", help="Salvar CSV em PT-BR (; e vírgula decimal).")
     ap.add_argument("--verbose", action="store_true")
     ap.add_argument("--limit", type=int, help="Processar no máx. N arquivos (debug).")
+    ap.add_argument("--incremental", action="store_true",
+                    help="Com --outdir: pula PDFs cujo CSV já existe e é mais novo que o PDF.")
     args = ap.parse_args()
 
     in_dir = Path(args.indir) if args.indir else None
@@ -249,18 +257,21 @@ def main():
                 log(f"⚠️  Ignorando (não deu para inferir ano): {p.name}")
                 continue
 
+            out_csv = outdir / f"anexo10_prev_arrec_{year}.csv"
+            if args.incremental and out_csv.exists() and out_csv.stat().st_mtime >= p.stat().st_mtime:
+                log(f"Pulando {p.name} (CSV já atualizado: {out_csv.name})")
+                continue
+
             log(f"Processando: {p.name}")
             df = extract_table_from_pdf(p, verbose=args.verbose)
             if df.empty:
                 log(f"Aviso: não foi possível localizar a tabela em {p.name}.")
                 # salva vazio para marcar tentativa (opcional: pular)
-                out_csv = outdir / f"anexo10_prev_arrec_{year}.csv"
                 save_csv(df, out_csv, ptbr=args.ptbr)
                 continue
 
             df.insert(0, "ano", year)
             df = df[["ano","codigo","especificacao","subitem","previsao","arrecadacao","para_mais","para_menos"]]
-            out_csv = outdir / f"anexo10_prev_arrec_{year}.csv"
             save_csv(df, out_csv, ptbr=args.ptbr)
             log(f"CSV salvo: {out_csv} (linhas: {len(df)})")
     else:
@@ -285,6 +296,7 @@ def main():
         if not all_frames:
             raise SystemExit("Nenhuma tabela extraída para concatenar.")
 
+        # pd.concat promove os tipos entre PDFs (coluna toda None num ano, float no outro)
         final = pd.concat(all_frames, ignore_index=True)
         final = final[["ano","codigo","especificacao","subitem","previsao","arrecadacao","para_mais","para_menos"]]
         save_csv(final, out_path, ptbr=args.ptbr)
@@ -4,13 +4,16 @@
 # roteamento por subpastas, coerção mínima por tabela destino (Entidade/Líquido),
 # compat extra para 'ano'/'exercicio' e 'líquido' vs 'liquido'.
 
-import os, sys, re, json, traceback, unicodedata
+import os, sys, re, io, csv, json, itertools, traceback, unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
 import argparse
 import pandas as pd
 import numpy as np
-import psycopg2, psycopg2.extras as pgx
+import psycopg2
+import pyarrow as pa
+import pyarrow.csv as pacsv
 
 # ---------- CLI ----------
 def parse_args():
@@ -22,6 +25,8 @@ def parse_args():
     p.add_argument("--add-year", action="store_true", help="Cria/normaliza coluna 'ano' a partir de 'exercicio' ou do nome do arquivo")
     p.add_argument("--numeric", action="store_true",
                    help="Limpa colunas monetárias (remove milhares e troca vírgula por ponto) — mantém como texto na staging")
+    p.add_argument("--jobs", type=int, default=1,
+                   help="Processos paralelos (1 conexão Postgres por processo). Default: 1 (sequencial)")
     return p.parse_args()
 
 # ---------- Conexão ----------
@@ -36,27 +41,33 @@ def get_conn():
 # ---------- Utils ----------
 TOTAL_PAT = re.compile(r"(?i)\btotal\b")
 DATE_IN_NAME = re.compile(r"(\d{4}-\d{2}-\d{2})")
-YEAR_IN_PATH = re.compile(r"(\d{4})")
+YEAR_RE = re.compile(r"(\d{4})")
 MONEY_LIKE = re.compile(r'^\s?-?\d{1,3}(\.\d{3})*,\d{2}\s?$')  # 1.234.567,89
 LOG_DIR = Path("logs"); LOG_DIR.mkdir(exist_ok=True)
+COPY_NULL = r"\N"          # marcador de NULL no COPY (vazio/NaN viram NULL, como antes)
+COPY_CHUNK_ROWS = 64_000   # linhas por bloco enviado ao COPY (limita o buffer em memória)
 
 def strip_total_rows(df):
     if df.empty: return df
-    mask = pd.Series(False, index=df.index)
-    for c in df.columns:
-        if pd.api.types.is_string_dtype(df[c]):
-            mask |= df[c].fillna("").str.contains(TOTAL_PAT)
-    return df.loc[~mask].copy()
+    str_cols = [c for c in df.columns if pd.api.types.is_string_dtype(df[c])]
+    if not str_cols: return df
+    # uma máscara booleana por coluna, reduzida de uma vez em numpy (sem |= em Python)
+    mask = np.logical_or.reduce([
+        df[c].str.contains(TOTAL_PAT, na=False).to_numpy(dtype=bool) for c in str_cols
+    ])
+    return df.loc[~mask]  # indexação booleana já devolve um novo DataFrame; sem .copy() extra
 
 def infer_year(path: Path):
     m = DATE_IN_NAME.search(path.name)
     if m:
         try: return datetime.strptime(m.group(1), "%Y-%m-%d").year
-        except: pass
-    m = YEAR_IN_PATH.search(path.as_posix())
-    if m:
-        y = int(m.group(1))
-        if 1900 <= y <= 2100: return y
+        except ValueError: pass
+    # nome do arquivo primeiro (ex.: ..._ano2024.csv), depois o caminho todo; um número fora da
+    # faixa no nome (relatorio_0001.csv) não impede o fallback para o caminho
+    for s in (path.name, path.as_posix()):
+        m = YEAR_RE.search(s)
+        if m and 1900 <= int(m.group(1)) <= 2100:
+            return int(m.group(1))
     return None
 
 def slugify(s: str) -> str:
@@ -83,53 +94,131 @@ def existing_cols(conn, schema, table):
         """, (schema, table))
         return [r[0] for r in cur.fetchall()]
 
+# colunas já conhecidas por (schema, tabela): evita reconsultar information_schema a cada arquivo
+_cols_cache: dict[tuple[str, str], set[str]] = {}
+
 def ensure_table_and_cols(conn, schema, table, cols, verbose=False):
     cols = [str(c) for c in cols]
-    cur_cols = existing_cols(conn, schema, table)
-    if not cur_cols:
-        with conn.cursor() as cur:
-            cur.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema}";')
-            coldef = ", ".join(f'"{c}" TEXT' for c in cols)
-            cur.execute(f'CREATE TABLE IF NOT EXISTS "{schema}"."{table}" ({coldef});')
-        conn.commit()
-        if verbose: print(f"🗃️ criada {schema}.{table} com {len(cols)} colunas")
-        return
-    # adiciona colunas novas se aparecerem
-    missing = [c for c in cols if c not in cur_cols]
+    key = (schema, table)
+    known = _cols_cache.get(key)
+    if known is None:
+        known = set(existing_cols(conn, schema, table))
+        if not known:
+            with conn.cursor() as cur:
+                coldef = ", ".join(f'"{c}" TEXT' for c in cols)
+                cur.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema}"; '
+                            f'CREATE TABLE IF NOT EXISTS "{schema}"."{table}" ({coldef});')
+            conn.commit()
+            _cols_cache[key] = set(cols)
+            if verbose: print(f"🗃️ criada {schema}.{table} com {len(cols)} colunas")
+            return
+        _cols_cache[key] = known
+    # adiciona colunas novas se aparecerem (todas num único round trip)
+    missing = [c for c in cols if c not in known]
     if missing:
         with conn.cursor() as cur:
-            for c in missing:
-                cur.execute(f'ALTER TABLE "{schema}"."{table}" ADD COLUMN IF NOT EXISTS "{c}" TEXT;')
+            cur.execute(" ".join(f'ALTER TABLE "{schema}"."{table}" ADD COLUMN IF NOT EXISTS "{c}" TEXT;' for c in missing))
         conn.commit()
+        known.update(missing)
         if verbose: print(f"🧱 {schema}.{table}: +{len(missing)} colunas: {missing}")
 
+class _CsvRowStream:
+    """
+    Adaptador file-like para o COPY: o psycopg2 puxa blocos via read(size) e as linhas do
+    iterável são serializadas em CSV sob demanda (um único COPY por arquivo, sem buffer do todo).
+    """
+    def __init__(self, rows, batch=1000):
+        self._rows = iter(rows)
+        self._batch = batch
+        self._buf = io.StringIO()
+        self._writer = csv.writer(self._buf, quoting=csv.QUOTE_MINIMAL, lineterminator="\n")
+        self._pending = ""
+        self._pos = 0  # offset de leitura em _pending (sem recortar o buffer a cada read)
+        self.count = 0
+        self.error = None  # exceção original do iterável (o psycopg2 a embrulha em QueryCanceled)
+
+    def read(self, size=-1):
+        while size < 0 or len(self._pending) - self._pos < size:
+            try:
+                chunk = list(itertools.islice(self._rows, self._batch))
+            except Exception as e:
+                self.error = e
+                raise
+            if not chunk: break
+            self._writer.writerows(chunk)
+            self.count += len(chunk)
+            # compacta só ao reabastecer (uma cópia por lote, não por read)
+            self._pending = self._pending[self._pos:] + self._buf.getvalue()
+            self._pos = 0
+            self._buf.seek(0); self._buf.truncate()
+        end = len(self._pending) if size < 0 else self._pos + size
+        out = self._pending[self._pos:end]
+        self._pos += len(out)
+        return out
+
+def refresh_dependent_mvs(conn, schema, table):
+    """REFRESH das materialized views que leem <schema>.<table> (ex.: vw_receita_aggregated do 05)."""
+    with conn.cursor() as cur:
+        cur.execute("""
+          SELECT DISTINCT v.oid::regclass::text
+          FROM pg_depend d
+          JOIN pg_rewrite r ON r.oid = d.objid
+          JOIN pg_class v   ON v.oid = r.ev_class
+          WHERE d.refobjid = to_regclass(%s) AND v.relkind = 'm'
+        """, (f'"{schema}"."{table}"',))
+        mvs = [r[0] for r in cur.fetchall()]
+        for mv in mvs:
+            cur.execute(f"REFRESH MATERIALIZED VIEW {mv};")
+    conn.commit()
+    for mv in mvs:
+        print(f"🔄 {mv} atualizada")
+
+def copy_rows(conn, schema, table, cols, rows) -> int:
+    """Envia um iterável de linhas (valores já em texto/COPY_NULL) via COPY FROM STDIN, em streaming."""
+    collist = ",".join('"%s"' % c for c in cols)
+    copy_sql = f'COPY "{schema}"."{table}" ({collist}) FROM STDIN WITH (FORMAT csv, NULL \'{COPY_NULL}\')'
+    stream = _CsvRowStream(rows)
+    with conn.cursor() as cur:
+        try:
+            cur.copy_expert(copy_sql, stream)
+        except Exception:
+            if stream.error is not None:
+                raise stream.error  # ex.: UnicodeDecodeError, em vez do QueryCanceled genérico
+            raise
+    conn.commit()
+    return stream.count
+
 def insert_df(conn, schema, table, df):
     if df.empty: return 0
-    cols = list(df.columns)
-    records = []
-    for row in df.itertuples(index=False, name=None):
-        rec = []
-        for v in row:
-            if pd.isna(v) or v == "":
-                rec.append(None)
-            else:
-                rec.append(str(v))
-        records.append(tuple(rec))
+    collist = ",".join('"%s"' % c for c in df.columns)
+    # aqui o CSV vem do writer do pyarrow: nulos saem como campo vazio sem aspas (NULL padrão do
+    # FORMAT csv) e strings sempre entre aspas
+    copy_sql = f'COPY "{schema}"."{table}" ({collist}) FROM STDIN WITH (FORMAT csv)'
+    opts = pacsv.WriteOptions(include_header=False)
     with conn.cursor() as cur:
-        pgx.execute_values(
-            cur,
-            f'INSERT INTO "{schema}"."{table}" ({",".join(f"""\"{c}\"""" for c in cols)}) VALUES %s',
-            records, page_size=1000
-        )
+        for start in range(0, len(df), COPY_CHUNK_ROWS):
+            part = df.iloc[start:start + COPY_CHUNK_ROWS]
+            # NaN/"" → NULL numa máscara vetorizada; serialização em C++ (pyarrow) em vez de csv.writer
+            part = part.astype(str).where(part.notna() & (part != ""), None)
+            tbl = pa.table({str(c): pa.array(part[c], type=pa.string(), from_pandas=True) for c in part.columns})
+            sink = pa.BufferOutputStream()
+            pacsv.write_csv(tbl, sink, opts)
+            cur.copy_expert(copy_sql, pa.BufferReader(sink.getvalue()))
     conn.commit()
-    return len(records)
+    return len(df)
 
 # ---------- sniff de separador/encoding ----------
+def _raw_sample(path: Path) -> bytes:
+    # 4 KiB cortados na última quebra de linha: não parte um caractere UTF-8 multibyte ao meio
+    with open(path, "rb") as fh:
+        raw = fh.read(4096)
+    cut = raw.rfind(b"\n")
+    return raw[:cut + 1] if cut > 0 else raw
+
 def sniff_sep_and_encoding(path: Path):
     # tenta utf-8-sig; se falhar, latin-1
     encodings = ["utf-8-sig", "latin-1", "utf-8"]
-    with open(path, "rb") as fh:
-        raw = fh.read(4096)
+    raw = _raw_sample(path)
     sample = None; encoding = None
     for enc in encodings:
         try:
@@ -149,48 +238,59 @@ def sniff_sep_and_encoding(path: Path):
     return sep, encoding
 
 # ---------- limpeza monetária ----------
-def looks_money_series(s: pd.Series) -> bool:
-    s2 = s.dropna().astype(str)
-    if s2.empty: return False
-    return (s2.str.match(MONEY_LIKE, na=False)).mean() >= 0.60
-
-def money_ptbr_to_dot(v: str) -> str:
-    if v is None: return v
-    t = str(v).strip()
-    if t == "" or t == "-": return ""
-    if MONEY_LIKE.match(t):
-        return t.replace(".", "").replace(",", ".")
-    return v
+def looks_money_series(s: pd.Series, is_money: pd.Series | None = None) -> bool:
+    valid = s.notna()
+    if not valid.any(): return False
+    if is_money is None:
+        is_money = s.str.strip().str.match(MONEY_LIKE, na=False)
+    return is_money[valid].mean() >= 0.60
+
+def money_ptbr_to_dot(s: pd.Series, t: pd.Series | None = None, is_money: pd.Series | None = None) -> pd.Series:
+    # vetorizado: "1.234,56" → "1234.56"; "" / "-" → ""; demais valores ficam como estão
+    if t is None:
+        t = s.str.strip()
+    if is_money is None:
+        is_money = t.str.match(MONEY_LIKE, na=False)
+    converted = t.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+    out = np.select(
+        [is_money.to_numpy(dtype=bool), t.isin(["", "-"]).to_numpy(dtype=bool)],
+        [converted.to_numpy(dtype=object), ""],
+        default=s.to_numpy(dtype=object),
+    )
+    return pd.Series(out, index=s.index, name=s.name)
 
 def normalize_money_columns(df: pd.DataFrame) -> pd.DataFrame:
-    if df.empty: return df
     for c in df.columns:
-        if pd.api.types.is_string_dtype(df[c]) and looks_money_series(df[c]):
-            df[c] = df[c].apply(money_ptbr_to_dot)
+        if not pd.api.types.is_string_dtype(df[c]): continue
+        # uma única passada de MONEY_LIKE por coluna, reaproveitada na detecção e na conversão
+        t = df[c].str.strip()
+        is_money = t.str.match(MONEY_LIKE, na=False)
+        if looks_money_series(df[c], is_money):
+            df[c] = money_ptbr_to_dot(df[c], t, is_money)
     return df
 
 # ---------- CSV parsing ----------
-def load_csv(path: Path, add_year, dedupe, numeric, verbose):
+# normaliza nomes: minúsculas e troca espaço/hífen/“ – ” por underscore
+_COL_TABLE = str.maketrans({"\ufeff": "", " ": "_", "-": "_", "/": "_", "–": "_", "—": "_"})
+_MULTI_UNDER = re.compile(r"_+")
+
+def norm_col(c: str) -> str:
+    return _MULTI_UNDER.sub("_", c.strip().translate(_COL_TABLE).lower())
+
+def load_csv(path: Path, add_year, dedupe, numeric, verbose, nrows=None):
     sep, enc = sniff_sep_and_encoding(path)
     if verbose:
         print(f"   → sep='{sep}' encoding='{enc}'")
 
-    df = pd.read_csv(path, sep=sep, dtype=str, engine="python", encoding=enc)
-    df = df.fillna("")
+    # engine C + na_filter=False: células vazias já chegam como "" (dispensa fillna)
+    df = pd.read_csv(path, sep=sep, dtype=str, engine="c", encoding=enc,
+                     keep_default_na=False, na_filter=False, low_memory=False, nrows=nrows)
 
     # remove linhas 'total' (se houver)
     if dedupe:
         before = len(df); df = strip_total_rows(df)
         if verbose and before != len(df): print(f"   linhas 'total' removidas: {before - len(df)}")
 
-    # normaliza nomes: minúsculas e troca espaço/hífen/“ – ” por underscore
-    def norm_col(c: str) -> str:
-        c2 = c.strip().replace("\ufeff","")
-        c2 = c2.replace("–","-").replace("—","-")
-        c2 = c2.lower().replace(" ", "_").replace("-", "_").replace("/", "_")
-        c2 = re.sub(r"_+", "_", c2)
-        return c2
-
     df.columns = [norm_col(c) for c in df.columns]
 
     # padroniza 'exercício' → 'exercicio'
@@ -199,10 +299,9 @@ def load_csv(path: Path, add_year, dedupe, numeric, verbose):
 
     # cria/normaliza 'ano'
     if add_year:
-        if "ano" in df.columns:
-            df["ano"] = df["ano"].astype(str).str.extract(r"(\d{4})")
-        elif "exercicio" in df.columns:
-            df["ano"] = df["exercicio"].astype(str).str.extract(r"(\d{4})")
+        src = "ano" if "ano" in df.columns else ("exercicio" if "exercicio" in df.columns else None)
+        if src is not None:
+            df["ano"] = df[src].str.extract(YEAR_RE, expand=False)
         else:
             y = infer_year(path)
             if y: df["ano"] = str(y)
@@ -217,6 +316,74 @@ def load_csv(path: Path, add_year, dedupe, numeric, verbose):
         except: pass
     return df
 
+# ---------- caminho direto CSV → COPY (sem pandas) ----------
+def mangle_header(header: list[str]) -> list[str]:
+    """Nomes como o pd.read_csv os entrega: vazio → 'Unnamed: i', repetido → 'x.1', 'x.2'..."""
+    names = [c if c != "" else f"Unnamed: {i}" for i, c in enumerate(header)]
+    # mesmo laço do parser C do pandas: pula sufixos que já existem no cabeçalho original
+    original = set(names)
+    counts: dict[str, int] = {}
+    for i, col in enumerate(names):
+        base, cur = col, counts.get(col, 0)
+        while cur > 0:
+            counts[base] = cur + 1
+            col = f"{base}.{cur}"
+            cur = cur + 1 if col in original else counts.get(col, 0)
+        names[i] = col
+        counts[col] = cur + 1
+    return names
+
+def plan_projection(header: list[str], target: str, verbose=False):
+    """
+    Resolve só pelos nomes do cabeçalho as colunas de destino e, para cada uma, o índice da
+    coluna de origem (None = coluna criada vazia). Reaproveita coerce_for_table sobre uma
+    linha-sonda cujas células guardam o índice da coluna original.
+    """
+    cols = [norm_col(c) for c in mangle_header(header)]
+    probe = pd.DataFrame([[str(i) for i in range(len(cols))]], columns=cols)
+    if "exercício" in probe.columns and "exercicio" not in probe.columns:
+        probe = probe.rename(columns={"exercício":"exercicio"})
+    probe = coerce_for_table(probe, target, verbose=verbose)
+    return list(probe.columns), [int(v) if v != "" else None for v in probe.iloc[0]]
+
+def read_header(path: Path):
+    sep, enc = sniff_sep_and_encoding(path)
+    with open(path, newline="", encoding=enc) as fh:
+        return next(csv.reader(fh, delimiter=sep), None)
+
+def stream_csv_to_table(conn, schema, path: Path, target: str, verbose=False) -> int:
+    """Lê o CSV linha a linha e envia direto ao COPY (válido sem --dedupe/--add-year/--numeric)."""
+    sep, enc = sniff_sep_and_encoding(path)
+    if verbose:
+        print(f"   → sep='{sep}' encoding='{enc}' (stream direto p/ COPY)")
+    with open(path, newline="", encoding=enc) as fh:
+        rd = csv.reader(fh, delimiter=sep)
+        header = next(rd, None)
+        if not header: return 0
+        cols, idx = plan_projection(header, target, verbose=verbose)
+        rows = (
+            [COPY_NULL if (i is None or i >= len(r) or r[i] == "") else r[i] for i in idx]
+            for r in rd if r
+        )
+        first = next(rows, None)
+        if first is None: return 0
+        if verbose:
+            print(f"   colunas finais: {cols}")
+        ensure_table_and_cols(conn, schema, target, cols, verbose=verbose)
+        return copy_rows(conn, schema, target, cols, itertools.chain([first], rows))
+
+# ---------- varredura ----------
+def iter_csvs(root: str):
+    # os.scandir com pilha explícita: usa o tipo do dirent (sem stat extra nem Path por entrada)
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False):
+                    stack.append(e.path)
+                elif e.name.endswith(".csv"):
+                    yield e.path
+
 # ---------- roteamento por pasta ----------
 def route_table(root: Path, file_path: Path) -> str:
     rel = file_path.relative_to(root)
@@ -293,6 +460,59 @@ def coerce_for_table(df: pd.DataFrame, target: str, verbose=False) -> pd.DataFra
 
     return df
 
+# ---------- carga por arquivo ----------
+def plan_file_columns(root: Path, f: Path, args):
+    """Colunas de destino de um CSV lendo só o cabeçalho (usado p/ DDL antes da carga paralela)."""
+    target = route_table(root, f)
+    if not (args.dedupe or args.add_year or args.numeric):
+        header = read_header(f)
+        return target, (plan_projection(header, target)[0] if header else [])
+    df = load_csv(f, args.add_year, args.dedupe, args.numeric, False, nrows=0)
+    return target, list(coerce_for_table(df, target).columns)
+
+def run_file(conn, root: Path, f: Path, args):
+    """Carrega um CSV na staging roteada. Devolve (linhas inseridas, erro|None); 0 linhas = vazio."""
+    rel = f.relative_to(root)
+    target = route_table(root, f)
+    df = None
+    try:
+        # sem limpezas pedidas, o CSV vai direto ao COPY sem passar por um DataFrame
+        if not (args.dedupe or args.add_year or args.numeric):
+            return stream_csv_to_table(conn, args.schema, f, target, verbose=args.verbose), None
+
+        df = load_csv(f, args.add_year, args.dedupe, args.numeric, args.verbose)
+        df = coerce_for_table(df, target, verbose=args.verbose)
+        if df.empty:
+            return 0, None
+
+        ensure_table_and_cols(conn, args.schema, target, list(df.columns), verbose=args.verbose)
+        return insert_df(conn, args.schema, target, df), None
+    except Exception as e:
+        try: conn.rollback()
+        except: pass
+        ctx = {"columns": list(df.columns) if df is not None else None}
+        log_error(rel, e, ctx)
+        return 0, str(e)
+
+def report_file(rel: Path, n: int, err):
+    if err is not None:
+        print(f"❌ Erro ao processar {rel}: {err}")
+        print(f"   → veja o log em: logs/{'__'.join(rel.parts)}.log")
+    elif n == 0:
+        print("   (vazio) — ignorado.")
+    else:
+        print(f"✅ Inserido: {n} linha(s).")
+
+# cada processo do pool mantém sua própria conexão (conexões psycopg2 não sobrevivem a fork)
+_worker_conn = None
+
+def _init_worker():
+    global _worker_conn
+    _worker_conn = get_conn()
+
+def _run_file_in_worker(root: Path, f: Path, args):
+    return run_file(_worker_conn, root, f, args)
+
 # ---------- main ----------
 def main():
     args = parse_args()
@@ -305,32 +525,50 @@ def main():
     except Exception as e:
         print("❌ falha na conexão Postgres:", e, file=sys.stderr); sys.exit(2)
 
-    files = sorted(root.rglob("*.csv"))
+    files = [Path(p) for p in sorted(iter_csvs(str(root)))]
     print(f"⚙️  encontrados {len(files)} CSVs sob {root}")
     total = 0
-
-    for f in files:
-        rel = f.relative_to(root)
-        target = route_table(root, f)
-        print(f"\n⚙️  Carregando {rel} → {args.schema}.{target}")
-        try:
-            df = load_csv(f, args.add_year, args.dedupe, args.numeric, args.verbose)
-            df = coerce_for_table(df, target, verbose=args.verbose)
-
-            if df.empty:
-                print("   (vazio) — ignorado."); continue
-
-            ensure_table_and_cols(conn, args.schema, target, list(df.columns), verbose=args.verbose)
-            n = insert_df(conn, args.schema, target, df)
+    loaded: set[str] = set()  # tabelas que receberam linhas
+
+    if args.jobs > 1:
+        # DDL serial antes de paralelizar: cria/estende cada tabela destino com a união das colunas
+        planned: dict[str, list[str]] = {}
+        for f in files:
+            try:
+                target, cols = plan_file_columns(root, f, args)
+            except Exception as e:
+                print(f"⚠️  não foi possível ler o cabeçalho de {f.relative_to(root)}: {e}")
+                continue
+            acc = planned.setdefault(target, [])
+            acc.extend(c for c in cols if c not in acc)
+        for target, cols in planned.items():
+            if cols:
+                ensure_table_and_cols(conn, args.schema, target, cols, verbose=args.verbose)
+
+        with ProcessPoolExecutor(max_workers=args.jobs, initializer=_init_worker) as pool:
+            futs = {pool.submit(_run_file_in_worker, root, f, args): f for f in files}
+            for fut in as_completed(futs):
+                f = futs[fut]
+                rel = f.relative_to(root)
+                target = route_table(root, f)
+                print(f"\n⚙️  Carregado {rel} → {args.schema}.{target}")
+                n, err = fut.result()
+                report_file(rel, n, err)
+                total += n
+                if n: loaded.add(target)
+    else:
+        for f in files:
+            rel = f.relative_to(root)
+            target = route_table(root, f)
+            print(f"\n⚙️  Carregando {rel} → {args.schema}.{target}")
+            n, err = run_file(conn, root, f, args)
+            report_file(rel, n, err)
             total += n
-            print(f"✅ Inserido: {n} linha(s).")
-        except Exception as e:
-            try: conn.rollback()
-            except: pass
-            ctx = {"columns": list(df.columns) if 'df' in locals() else None}
-            log_error(rel, e, ctx)
-            print(f"❌ Erro ao processar {rel}: {e}")
-            print(f"   → veja o log em: logs/{'__'.join(rel.parts)}.log")
+            if n: loaded.add(target)
+
+    # MVs sobre a staging (vw_receita_aggregated do 05) não se atualizam sozinhas
+    for target in sorted(loaded):
+        refresh_dependent_mvs(conn, args.schema, target)
 
     print(f"\n🎯 Concluído. Linhas inseridas: {total}")
 
@@ -28,6 +28,7 @@ Dependências: pandas, sqlalchemy, psycopg2-binary
 
 from __future__ import annotations
 import argparse
+import io
 import os
 from pathlib import Path
 from typing import List
@@ -50,7 +51,15 @@ CREATE TABLE IF NOT EXISTS {staging_schema}.stg_receitas (
 );
 """
 
+# Layout esperado de stg_receitas (coluna, tipo) — deve acompanhar DDL_STG_RECEITAS
+STG_RECEITAS_SCHEMA = [
+    ("ano", "integer"), ("codigo", "text"), ("especificacao", "text"), ("subitem", "text"),
+    ("previsao", "numeric"), ("arrecadacao", "numeric"), ("para_mais", "numeric"), ("para_menos", "numeric"),
+]
+STG_RECEITAS_COLS = [c for c, _ in STG_RECEITAS_SCHEMA]
+
 # Índices simples para acelerar GROUP BY/filters mais comuns
+# (criados DEPOIS da carga: construir o B-tree uma vez é mais barato que mantê-lo linha a linha)
 IDX_STG_RECEITAS = [
     "CREATE INDEX IF NOT EXISTS idx_stg_receitas_ano ON {staging_schema}.stg_receitas(ano);",
     "CREATE INDEX IF NOT EXISTS idx_stg_receitas_codigo ON {staging_schema}.stg_receitas(codigo);",
@@ -58,21 +67,55 @@ IDX_STG_RECEITAS = [
     "CREATE INDEX IF NOT EXISTS idx_stg_receitas_subitem ON {staging_schema}.stg_receitas(subitem);",
 ]
 
-# Views (nivel categoria, subitens e resumo anual)
-VW_RECEITA_POR_TIPO = """
-CREATE OR REPLACE VIEW {schema}.vw_receita_por_tipo AS
+# Agregado único (materializado) sobre stg_receitas: um só scan com GROUPING SETS alimenta as 3 views.
+# Recriado a cada execução do 05 (DROP + CREATE): mudanças na definição sempre entram; cargas do
+# 04 em stg_receitas fazem REFRESH MATERIALIZED VIEW ao final.
+#   nivel = 'tipo' → linha de categoria (sem subitem, com especificação)
+#   nivel = 'sub'  → subitem
+#   grp   = 1      → total do ano (todas as linhas)
+MV_RECEITA_AGREGADA = """
+CREATE MATERIALIZED VIEW {schema}.vw_receita_aggregated AS
+WITH base AS (
+    SELECT
+        ano,
+        CASE
+            WHEN NULLIF(TRIM(subitem), '') IS NOT NULL THEN 'sub'
+            WHEN NULLIF(TRIM(especificacao), '') IS NOT NULL THEN 'tipo'
+        END                                AS nivel,
+        LPAD(codigo, 2, '0')               AS codigo,
+        TRIM(COALESCE(especificacao, ''))  AS especificacao,
+        TRIM(COALESCE(subitem, ''))        AS subitem,
+        previsao, arrecadacao, para_mais, para_menos
+    FROM {staging_schema}.stg_receitas
+)
 SELECT
     ano,
-    LPAD(codigo, 2, '0') AS codigo,   -- garante "11", "12", ...
-    TRIM(especificacao)  AS especificacao,
-    SUM(previsao)   AS previsao,
+    nivel,
+    codigo,
+    especificacao,
+    subitem,
+    GROUPING(nivel, codigo, especificacao, subitem) AS grp,
+    SUM(previsao)    AS previsao,
     SUM(arrecadacao) AS arrecadacao,
     SUM(para_mais)   AS para_mais,
     SUM(para_menos)  AS para_menos
-FROM {staging_schema}.stg_receitas
-WHERE COALESCE(NULLIF(TRIM(subitem), ''), NULL) IS NULL       -- ignora subitens
-  AND COALESCE(NULLIF(TRIM(especificacao), ''), NULL) IS NOT NULL
-GROUP BY ano, LPAD(codigo, 2, '0'), TRIM(especificacao)
+FROM base
+GROUP BY GROUPING SETS ((ano), (ano, nivel, codigo, especificacao, subitem));
+"""
+
+# Views (nivel categoria, subitens e resumo anual) — filtros baratos sobre o agregado
+VW_RECEITA_POR_TIPO = """
+CREATE OR REPLACE VIEW {schema}.vw_receita_por_tipo AS
+SELECT
+    ano,
+    codigo,                           -- LPAD: garante "11", "12", ...
+    especificacao,
+    previsao,
+    arrecadacao,
+    para_mais,
+    para_menos
+FROM {schema}.vw_receita_aggregated
+WHERE grp = 0 AND nivel = 'tipo'      -- ignora subitens
 ORDER BY ano, codigo;
 """
 
@@ -80,16 +123,15 @@ VW_RECEITA_POR_SUBITEM = """
 CREATE OR REPLACE VIEW {schema}.vw_receita_por_subitem AS
 SELECT
     ano,
-    LPAD(codigo, 2, '0') AS codigo,
-    TRIM(COALESCE(especificacao, '')) AS especificacao_pai,
-    TRIM(subitem) AS subitem,
-    SUM(previsao)   AS previsao,
-    SUM(arrecadacao) AS arrecadacao,
-    SUM(para_mais)   AS para_mais,
-    SUM(para_menos)  AS para_menos
-FROM {staging_schema}.stg_receitas
-WHERE COALESCE(NULLIF(TRIM(subitem), ''), NULL) IS NOT NULL
-GROUP BY ano, LPAD(codigo, 2, '0'), TRIM(COALESCE(especificacao, '')), TRIM(subitem)
+    codigo,
+    especificacao AS especificacao_pai,
+    subitem,
+    previsao,
+    arrecadacao,
+    para_mais,
+    para_menos
+FROM {schema}.vw_receita_aggregated
+WHERE grp = 0 AND nivel = 'sub'
 ORDER BY ano, codigo, especificacao_pai, subitem;
 """
 
@@ -97,12 +139,12 @@ VW_RECEITA_RESUMO_ANUAL = """
 CREATE OR REPLACE VIEW {schema}.vw_receita_resumo_anual AS
 SELECT
     ano,
-    SUM(previsao)   AS previsao_total,
-    SUM(arrecadacao) AS arrecadacao_total,
-    SUM(para_mais)   AS para_mais_total,
-    SUM(para_menos)  AS para_menos_total
-FROM {staging_schema}.stg_receitas
-GROUP BY ano
+    previsao    AS previsao_total,
+    arrecadacao AS arrecadacao_total,
+    para_mais   AS para_mais_total,
+    para_menos  AS para_menos_total
+FROM {schema}.vw_receita_aggregated
+WHERE grp <> 0
 ORDER BY ano;
 """
 
@@ -115,25 +157,73 @@ def info(msg: str, verbose: bool):
 def ensure_schema(conn, schema: str):
     conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema};"))
 
+def staging_columns(conn, staging_schema: str) -> List[tuple]:
+    """(coluna, tipo) da stg_receitas atual, em ordem; [] se a tabela não existir."""
+    rows = conn.execute(text("""
+        SELECT attname, format_type(atttypid, atttypmod)
+        FROM pg_attribute
+        WHERE attrelid = to_regclass(:q) AND attnum > 0 AND NOT attisdropped
+        ORDER BY attnum;
+    """), {"q": f"{staging_schema}.stg_receitas"}).fetchall()
+    return [tuple(r) for r in rows]
+
+# nomes dos índices de IDX_STG_RECEITAS ("... IF NOT EXISTS <nome> ON ...")
+IDX_STG_RECEITAS_NAMES = [ddl.split(" IF NOT EXISTS ", 1)[1].split()[0] for ddl in IDX_STG_RECEITAS]
+
+def drop_staging_indexes(conn, staging_schema: str):
+    for name in IDX_STG_RECEITAS_NAMES:
+        conn.execute(text(f"DROP INDEX IF EXISTS {staging_schema}.{name};"))
+
 def recreate_staging(conn, staging_schema: str, verbose: bool):
+    # mesmo layout → TRUNCATE (só metadados; preserva views/MV dependentes)
+    if staging_columns(conn, staging_schema) == STG_RECEITAS_SCHEMA:
+        info("🧹 Esvaziando staging stg_receitas (TRUNCATE)…", verbose)
+        # sem os índices durante o COPY; build_staging_indexes recria após a carga
+        drop_staging_indexes(conn, staging_schema)
+        conn.execute(text(f"TRUNCATE TABLE {staging_schema}.stg_receitas;"))
+        return
+    # layout diferente → DROP + CREATE; views dependentes são recriadas em create_views
     info("🧹 Recriando staging stg_receitas…", verbose)
-    conn.execute(text(f"DROP TABLE IF EXISTS {staging_schema}.stg_receitas;"))
+    conn.execute(text(f"DROP TABLE IF EXISTS {staging_schema}.stg_receitas CASCADE;"))
     conn.execute(text(DDL_STG_RECEITAS.format(staging_schema=staging_schema)))
-    for ddl in IDX_STG_RECEITAS:
-        conn.execute(text(ddl.format(staging_schema=staging_schema)))
 
 def create_if_not_exists_staging(conn, staging_schema: str, verbose: bool):
     info("ℹ️  Garantindo staging stg_receitas…", verbose)
     conn.execute(text(DDL_STG_RECEITAS.format(staging_schema=staging_schema)))
+
+def build_staging_indexes(conn, staging_schema: str, verbose: bool):
+    info("🗂️  Criando índices da staging…", verbose)
+    conn.execute(text("SET LOCAL maintenance_work_mem = '1GB';"))
     for ddl in IDX_STG_RECEITAS:
         conn.execute(text(ddl.format(staging_schema=staging_schema)))
 
 def create_views(conn, schema: str, staging_schema: str, verbose: bool):
     info("📐 (Re)criando views…", verbose)
+    # CASCADE derruba as 3 views dependentes, recriadas logo abaixo na mesma transação
+    conn.execute(text(f"DROP MATERIALIZED VIEW IF EXISTS {schema}.vw_receita_aggregated CASCADE;"))
+    conn.execute(text(MV_RECEITA_AGREGADA.format(schema=schema, staging_schema=staging_schema)))
     conn.execute(text(VW_RECEITA_POR_TIPO.format(schema=schema, staging_schema=staging_schema)))
     conn.execute(text(VW_RECEITA_POR_SUBITEM.format(schema=schema, staging_schema=staging_schema)))
     conn.execute(text(VW_RECEITA_RESUMO_ANUAL.format(schema=schema, staging_schema=staging_schema)))
 
+
+def copy_df(engine, df: pd.DataFrame, dest_table: str, cols: List[str]):
+    """Grava o DataFrame via COPY FROM STDIN (CSV em memória; NaN -> NULL)."""
+    buf = io.StringIO()
+    df[cols].to_csv(buf, index=False, header=False, na_rep="\\N")
+    buf.seek(0)
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cur:
+            # staging é recarregável a partir dos CSVs: não precisa esperar o flush do WAL
+            cur.execute("SET LOCAL synchronous_commit = OFF;")
+            cur.copy_expert(
+                f"COPY {dest_table} ({','.join(cols)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buf
+            )
+        raw.commit()
+    finally:
+        raw.close()
+
 def load_csvs(engine, csvdir: Path, years: List[int], staging_schema: str, verbose: bool):
     dest_table = f"{staging_schema}.stg_receitas"
     for y in years:
@@ -143,11 +233,11 @@ def load_csvs(engine, csvdir: Path, years: List[int], staging_schema: str, verbo
             continue
 
         info(f"⬆️  Carregando {csv_path.name}…", verbose)
-        df = pd.read_csv(csv_path)
+        # tudo como texto: o COPY envia o decimal original ao NUMERIC (sem ida e volta por float64)
+        df = pd.read_csv(csv_path, dtype=str)
 
         # Normalizações seguras
-        expected_cols = ["ano","codigo","especificacao","subitem","previsao","arrecadacao","para_mais","para_menos"]
-        missing = [c for c in expected_cols if c not in df.columns]
+        missing = [c for c in STG_RECEITAS_COLS if c not in df.columns]
         if missing:
             raise ValueError(f"{csv_path.name}: colunas ausentes: {missing}")
 
@@ -156,20 +246,12 @@ def load_csvs(engine, csvdir: Path, years: List[int], staging_schema: str, verbo
         for c in ["especificacao","subitem"]:
             df[c] = df[c].fillna("").astype(str)
 
-        # garante numéricos (NaN -> None)
+        # garante numéricos: valida com to_numeric e anula o que não for número (NaN -> NULL)
         for c in ["previsao","arrecadacao","para_mais","para_menos"]:
-            df[c] = pd.to_numeric(df[c], errors="coerce")
-
-        # grava
-        df.to_sql(
-            name="stg_receitas",
-            con=engine,
-            schema=staging_schema,
-            if_exists="append",
-            index=False,
-            method="multi",
-            chunksize=10_000,
-        )
+            df[c] = df[c].str.strip().where(pd.to_numeric(df[c], errors="coerce").notna())
+
+        # grava (COPY é bem mais rápido que INSERT multi-linhas do to_sql)
+        copy_df(engine, df, dest_table, STG_RECEITAS_COLS)
 
 # ---------------------------------------------------------------------
 
@@ -179,7 +261,7 @@ def parse_args():
     ap.add_argument("--schema", default="public", help="Schema alvo das views (default: public)")
     ap.add_argument("--staging", default="public", help="Schema de staging (default: public)")
     ap.add_argument("--years", required=True, help="Intervalo de anos, ex.: 2018-2025 ou lista: 2018,2019,2020")
-    ap.add_argument("--recreate", action="store_true", help="Drop & create da tabela de staging")
+    ap.add_argument("--recreate", action="store_true", help="Esvazia a staging (TRUNCATE; DROP & create se o layout mudou)")
     ap.add_argument("--verbose", action="store_true")
     return ap.parse_args()
 
@@ -214,8 +296,9 @@ def main():
     # carga
     load_csvs(engine, csvdir, years, args.staging, args.verbose)
 
-    # views
+    # índices (após a carga) + views
     with engine.begin() as conn:
+        build_staging_indexes(conn, args.staging, args.verbose)
         create_views(conn, args.schema, args.staging, args.verbose)
 
     if args.verbose:
@@ -31,6 +31,8 @@ import argparse
 import os
 import sys
 import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
@@ -48,6 +50,11 @@ NEG_RECEITA_ALLOW = {
     "deducoes de receita para a formacao do fundeb",
 }
 
+# norm_txt() em SQL: btrim + remoção dos acentos usuais do pt-BR + lower. O translate cobre
+# maiúsculas e minúsculas e roda antes do lower(): num banco LC_CTYPE=C, lower('Ú') mantém 'Ú'.
+SQL_ACENTOS = ("áàâãäéèêëíìîïóòôõöúùûüçÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇ",
+               "aaaaaeeeeiiiiooooouuuucAAAAAEEEEIIIIOOOOOUUUUC")
+
 STAGING_TABLES = [
     "stg_despesas_empenhadas",
     "stg_despesas_liquidadas",
@@ -55,6 +62,14 @@ STAGING_TABLES = [
     "stg_receitas",
 ]
 
+# conversão numérica do staging como função IMMUTABLE (mesma definição de 07_backfill_historico.py)
+NUMERIC_FN = "stg_to_numeric"
+USE_NUMERIC_FN = False  # ligado em main() quando a função instalada tem exatamente NUMERIC_FN_BODY
+NUM_SUFFIX = "__num"    # sufixo das colunas geradas <col>__num = stg_to_numeric(<col>) (--materialize-values)
+
+# relatórios a partir deste tamanho são gravados pelo writer nativo do PyArrow
+ARROW_CSV_MIN_ROWS = 50_000
+
 CRITICAL_FLAGS: List[str] = []
 VERBOSE = False
 
@@ -64,13 +79,19 @@ def log(msg: str):
     if VERBOSE:
         print(msg)
 
+# Remove diacríticos combinantes (bloco U+0300–U+036F) via str.translate, em C
+_STRIP_MARKS = dict.fromkeys(range(0x0300, 0x0370))
+
+@lru_cache(maxsize=4096)
 def norm_txt(s: str) -> str:
     if s is None:
         return ""
     s = s.strip().lower()
-    s = "".join(c for c in unicodedata.normalize("NFD", s) if unicodedata.category(c) != "Mn")
-    return s
+    if s.isascii():
+        return s
+    return unicodedata.normalize("NFD", s).translate(_STRIP_MARKS)
 
+@lru_cache(maxsize=4096)
 def norm_key(s: str) -> str:
     """normaliza para casar padrões de nomes de colunas (ex.: 'Líquido - Orçamento' -> 'liquido___orcamento')"""
     s = norm_txt(s)
@@ -99,61 +120,86 @@ def eng_from_env():
     url = url.replace("postgresql+psycopg2://", "postgresql://")
     return create_engine(url, future=True)
 
-def df_query(engine, sql: str, params: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
-    with engine.begin() as con:
-        return pd.read_sql_query(text(sql), con, params=params or {})
+def df_query(con, sql: str, params: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+    return pd.read_sql_query(text(sql), con, params=params or {})
 
 def save_report(df: pd.DataFrame, path: Path):
     path.parent.mkdir(parents=True, exist_ok=True)
-    df.to_csv(path, index=False, encoding="utf-8")
+    if len(df) < ARROW_CSV_MIN_ROWS or not write_csv_arrow(df, path):
+        df.to_csv(path, index=False, encoding="utf-8")
     print(f"📝 Relatório salvo: {path}")
 
+def write_csv_arrow(df: pd.DataFrame, path: Path) -> bool:
+    """Grava CSV via pyarrow.csv (C++, multi-thread). False se pyarrow indisponível ou tipos não suportados."""
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+        pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), str(path))
+        return True
+    except (ImportError, ValueError, TypeError, NotImplementedError) as e:
+        log(f"[csv] pyarrow não gravou {path.name} ({e}); usando pandas.to_csv")
+        return False
+
+# Texto pt-BR/US → numeric ({s} = expressão de texto). Sem dígitos ('', '-', '.', NULL) → 0;
+# vírgula presente → pt-BR (translate tira os pontos de milhar e troca vírgula por ponto);
+# sem vírgula e com mais de um ponto → pontos de milhar ('1.234.567'); parênteses e '-' no
+# início ou no fim ('1.234,56-') → negativo. O que sobrar inválido (ex.: '1,2,3', '2024-01-01')
+# falha no cast em vez de virar 0 em silêncio.
+NUMERIC_EXPR = """CASE WHEN {s} IS NULL OR {s} !~ '[0-9]' THEN 0::numeric
+     ELSE CASE WHEN left({s}, 1) = '(' AND right({s}, 1) = ')' THEN -1 ELSE 1 END
+        * CASE WHEN {s} ~ '^[^0-9]*-' OR {s} ~ '-[^0-9]*$' THEN -1 ELSE 1 END
+        * CASE WHEN {s} ~ '[0-9][^0-9]*-[^0-9]*[0-9]' THEN {s}::numeric
+               WHEN position(',' in {s}) > 0 THEN translate(REGEXP_REPLACE({s}, '[^0-9,.]', '', 'g'), ',.', '.')::numeric
+               WHEN {s} ~ '[.].*[.]' THEN REGEXP_REPLACE({s}, '[^0-9]', '', 'g')::numeric
+               ELSE REGEXP_REPLACE({s}, '[^0-9.]', '', 'g')::numeric END
+END"""
+NUMERIC_FN_BODY = f"SELECT {NUMERIC_EXPR.format(s='s')}"  # mesmo corpo criado pelo 07 (dono da função)
+
 def to_numeric_sql(col_quoted: str) -> str:
+    """Conversão inline (fallback sem a função): mesma NUMERIC_EXPR do corpo de stg_to_numeric."""
+    return f"({NUMERIC_EXPR.format(s=col_quoted)})"
+
+def numeric_fn_body(con, schema: str) -> Optional[str]:
+    """Corpo instalado de <schema>.stg_to_numeric(text), ou None se a função não existe."""
+    body = con.execute(text("SELECT prosrc FROM pg_proc WHERE oid = to_regprocedure(:fn)"),
+                       {"fn": f'"{schema}".{NUMERIC_FN}(text)'}).scalar()
+    return body.strip() if body is not None else None
+
+def numeric_expr(schema_stg: str, table: str, col: str) -> str:
     """
-    Conversor SQL robusto pt-BR/US:
-      - se houver vírgula → trata como pt-BR (remove pontos, vírgula -> ponto)
-      - senão → mantém ponto como decimal
-      - negativos com parênteses: (123,45) → -123.45
-    """
-    return f"""
-    (
-      CASE
-        WHEN {col_quoted} IS NULL OR {col_quoted} = '' THEN 0::numeric
-        ELSE
-          (
-            CASE WHEN {col_quoted} LIKE '(%%' AND {col_quoted} LIKE '%%)' THEN -1 ELSE 1 END
-          ) * (
-            CASE
-              WHEN {col_quoted} LIKE '%%,%%' THEN
-                NULLIF(
-                  REPLACE(
-                    REPLACE(
-                      REGEXP_REPLACE({col_quoted}, '[^0-9,().-]', '', 'g'),
-                    '.', ''), ',', '.'
-                  ),
-                '')::numeric
-              ELSE
-                NULLIF(
-                  REGEXP_REPLACE({col_quoted}, '[^0-9().-]', '', 'g'),
-                '')::numeric
-            END
-          )
-      END
-    )
+    Valor numérico de uma coluna do staging: a coluna gerada <col>__num se existir (parse já
+    pago na carga), senão a função, senão o CASE inline.
     """
+    if col + NUM_SUFFIX in _COLS_CACHE.get((schema_stg, table), []):
+        return f'"{col + NUM_SUFFIX}"'
+    if USE_NUMERIC_FN:
+        return f'"{schema_stg}".{NUMERIC_FN}("{col}")'
+    return to_numeric_sql(f'"{col}"')
 
 # --- introspecção dinâmica de colunas ---
 
-def get_columns(engine, schema: str, table: str) -> List[str]:
+_COLS_CACHE: Dict[Tuple[str, str], List[str]] = {}
+
+def get_columns(con, schema: str, table: str) -> List[str]:
+    """Colunas da tabela (memoizado por (schema, tabela) durante a execução)."""
+    key = (schema, table)
+    if key not in _COLS_CACHE:
+        prefetch_columns(con, schema, [table])
+    return _COLS_CACHE[key]
+
+def prefetch_columns(con, schema: str, tables: List[str]) -> None:
+    """Carrega no cache as colunas de várias tabelas com uma única consulta ao catálogo."""
     sql = """
-      SELECT column_name
+      SELECT table_name, column_name
       FROM information_schema.columns
-      WHERE table_schema = :s AND table_name = :t
-      ORDER BY ordinal_position;
+      WHERE table_schema = :s AND table_name = ANY(:ts)
+      ORDER BY table_name, ordinal_position;
     """
-    with engine.begin() as con:
-        rows = con.execute(text(sql), {"s": schema, "t": table}).fetchall()
-    return [r[0] for r in rows]
+    out: Dict[str, List[str]] = {t: [] for t in tables}
+    for t, c in con.execute(text(sql), {"s": schema, "ts": list(tables)}).fetchall():
+        out[t].append(c)
+    for t, cols in out.items():
+        _COLS_CACHE[(schema, t)] = cols
 
 def find_col(cols: List[str], candidates: List[str]) -> Optional[str]:
     cmap = {norm_txt(c): c for c in cols}
@@ -169,29 +215,34 @@ def find_col(cols: List[str], candidates: List[str]) -> Optional[str]:
                 return v
     return None
 
+def norm_cols(cols: List[str]) -> List[Tuple[str, str]]:
+    """Pares (coluna, norm_key) — calculados uma vez por tabela e reutilizados nas buscas."""
+    return [(c, norm_key(c)) for c in cols if not c.endswith(NUM_SUFFIX)]
+
 def find_col_contains(cols: List[str], must_have: List[str]) -> Optional[str]:
     """
     Encontra a primeira coluna cujo nome normalizado contenha TODOS os termos em must_have.
     """
-    nmap = {c: norm_key(c) for c in cols}
-    for col, nk in nmap.items():
-        ok = True
-        for term in must_have:
-            if term not in nk:
-                ok = False
-                break
-        if ok:
+    return find_nkey_contains(norm_cols(cols), must_have)
+
+def find_nkey_contains(nkeys: List[Tuple[str, str]], must_have: List[str]) -> Optional[str]:
+    for col, nk in nkeys:
+        if all(term in nk for term in must_have):
             return col
     return None
 
-def year_col(engine, schema: str, table: str) -> str:
-    cols = get_columns(engine, schema, table)
+def year_col(con, schema: str, table: str) -> str:
+    cols = get_columns(con, schema, table)
     y = find_col(cols, ["exercicio", "ano"])
     if not y:
         raise RuntimeError(f"Não encontrei coluna de ano em {schema}.{table}. Colunas: {cols}")
     return y
 
-def resolve_stg_amount_cols(engine, schema_stg: str) -> Dict[str, Optional[str]]:
+def year_key_sql(ycol: str) -> str:
+    """Ano do staging como int — mesma expressão do índice idx_<tabela>_ano_int (aqui e no 07)."""
+    return f"(NULLIF(\"{ycol}\", '')::int)"
+
+def resolve_stg_amount_cols(con, schema_stg: str) -> Dict[str, Optional[str]]:
     """
     Resolve nomes reais das colunas de valor em cada staging com base em padrões normalizados.
     Retorna dict com chaves:
@@ -206,34 +257,34 @@ def resolve_stg_amount_cols(engine, schema_stg: str) -> Dict[str, Optional[str]]
     }
 
     # EMPENHADAS
-    cols_emp = get_columns(engine, schema_stg, "stg_despesas_empenhadas")
-    out["emp_liquido"] = find_col_contains(cols_emp, ["liquido"])
+    cols_emp = norm_cols(get_columns(con, schema_stg, "stg_despesas_empenhadas"))
+    out["emp_liquido"] = find_nkey_contains(cols_emp, ["liquido"])
     if not out["emp_liquido"]:
         # fallback: alguns portais chamam de 'empenhado'
-        out["emp_empenhado"] = find_col_contains(cols_emp, ["empenhad"])
+        out["emp_empenhado"] = find_nkey_contains(cols_emp, ["empenhad"])
 
     # LIQUIDADAS
-    cols_liq = get_columns(engine, schema_stg, "stg_despesas_liquidadas")
+    cols_liq = norm_cols(get_columns(con, schema_stg, "stg_despesas_liquidadas"))
     out["liq_orc"] = (
-        find_col_contains(cols_liq, ["liquid", "orcamento"]) or
-        find_col_contains(cols_liq, ["liquido", "orcamento"])
+        find_nkey_contains(cols_liq, ["liquid", "orcamento"]) or
+        find_nkey_contains(cols_liq, ["liquido", "orcamento"])
     )
     out["liq_rap"] = (
-        find_col_contains(cols_liq, ["liquid", "restos"]) or
-        find_col_contains(cols_liq, ["liquid", "pagar"]) or
-        find_col_contains(cols_liq, ["liquido", "restos"]) or
-        find_col_contains(cols_liq, ["liquido", "pagar"])
+        find_nkey_contains(cols_liq, ["liquid", "restos"]) or
+        find_nkey_contains(cols_liq, ["liquid", "pagar"]) or
+        find_nkey_contains(cols_liq, ["liquido", "restos"]) or
+        find_nkey_contains(cols_liq, ["liquido", "pagar"])
     )
 
     # PAGAS
-    cols_pag = get_columns(engine, schema_stg, "stg_despesas_pagas")
+    cols_pag = norm_cols(get_columns(con, schema_stg, "stg_despesas_pagas"))
     out["pag_orc"] = (
-        find_col_contains(cols_pag, ["pago", "orcamento"]) or
-        find_col_contains(cols_pag, ["pago", "orc"])
+        find_nkey_contains(cols_pag, ["pago", "orcamento"]) or
+        find_nkey_contains(cols_pag, ["pago", "orc"])
     )
     out["pag_rap"] = (
-        find_col_contains(cols_pag, ["pago", "restos"]) or
-        find_col_contains(cols_pag, ["pago", "pagar"])
+        find_nkey_contains(cols_pag, ["pago", "restos"]) or
+        find_nkey_contains(cols_pag, ["pago", "pagar"])
     )
 
     log(f"[R4] Colunas detectadas (empenhadas): {out['emp_liquido'] or out['emp_empenhado']}")
@@ -241,226 +292,234 @@ def resolve_stg_amount_cols(engine, schema_stg: str) -> Dict[str, Optional[str]]
     log(f"[R4] Colunas detectadas (pagas): pag_orc={out['pag_orc']}, pag_rap={out['pag_rap']}")
     return out
 
+def migrate_staging(con, schema_stg: str, index_years: bool, materialize: bool) -> None:
+    """
+    Migração opcional (admin) do staging para o R4:
+      - índice de expressão no ano (mesmo nome/expressão do 07 --index-staging), usado pelo filtro --years;
+      - colunas geradas STORED <col>__num = stg_to_numeric(<col>) nas colunas de valor: o parse
+        passa a ser pago uma vez na carga (o COPY do 04 usa lista de colunas), não a cada execução.
+    """
+    prefetch_columns(con, schema_stg, STAGING_TABLES)
+    amt = resolve_stg_amount_cols(con, schema_stg)
+    valores = {
+        "stg_despesas_empenhadas": [amt["emp_liquido"] or amt["emp_empenhado"]],
+        "stg_despesas_liquidadas": [amt["liq_orc"], amt["liq_rap"]],
+        "stg_despesas_pagas": [amt["pag_orc"], amt["pag_rap"]],
+        "stg_receitas": ["previsao", "arrecadacao"],
+    }
+    for t in STAGING_TABLES:
+        cols = get_columns(con, schema_stg, t)
+        if not cols:
+            continue
+        if index_years:
+            con.execute(text(f'CREATE INDEX IF NOT EXISTS "idx_{t}_ano_int" ON "{schema_stg}"."{t}" ({year_key_sql(year_col(con, schema_stg, t))});'))
+        if materialize:
+            for c in (c for c in valores[t] if c and c in cols):
+                con.execute(text(f'''
+                  ALTER TABLE "{schema_stg}"."{t}"
+                  ADD COLUMN IF NOT EXISTS "{c + NUM_SUFFIX}" numeric
+                  GENERATED ALWAYS AS ("{schema_stg}".{NUMERIC_FN}("{c}")) STORED;
+                '''))
+        log(f"[staging] {t}: índice de ano={index_years}, colunas numéricas materializadas={materialize}")
+    _COLS_CACHE.clear()  # colunas novas: relê o catálogo nas regras
+
 # ================= Regras =================
 
-def r1_inequalities(engine, schema: str) -> pd.DataFrame:
-    sql = f"""
-      SELECT exercicio, entidade, valor_empenhado, valor_liquidado, valor_pago,
-             CASE WHEN COALESCE(valor_pago,0) <= COALESCE(valor_liquidado,0)
-                       AND COALESCE(valor_liquidado,0) <= COALESCE(valor_empenhado,0)
-                  THEN 0 ELSE 1 END AS violacao
-      FROM "{schema}"."fato_despesa";
+# predicado de violação do R1 — o mesmo texto no índice parcial e na consulta, p/ o planner casar
+R1_VIOLACAO_SQL = (
+    "NOT (COALESCE(valor_pago,0) <= COALESCE(valor_liquidado,0)"
+    " AND COALESCE(valor_liquidado,0) <= COALESCE(valor_empenhado,0))"
+)
+
+def ensure_r1_index(con, schema: str) -> None:
+    """Índice parcial só com as linhas violadoras: sem violações, o COUNT do R1 lê um índice vazio."""
+    con.execute(text(f'CREATE INDEX IF NOT EXISTS "idx_fato_despesa_r1_violacao" ON "{schema}"."fato_despesa" (exercicio) WHERE {R1_VIOLACAO_SQL};'))
+
+def r1_inequalities(con, schema: str, cap: int) -> Tuple[int, pd.DataFrame]:
     """
-    df = df_query(engine, sql)
-    return df[df["violacao"] == 1][["exercicio","entidade","valor_empenhado","valor_liquidado","valor_pago"]]
-
-def r2_negatives(engine, schema: str) -> pd.DataFrame:
-    qd = f"""
-      SELECT 'fato_despesa' AS tabela, exercicio, entidade,
-             'valor_empenhado' AS campo, valor_empenhado AS valor
-      FROM "{schema}"."fato_despesa" WHERE valor_empenhado < 0
-      UNION ALL
-      SELECT 'fato_despesa', exercicio, entidade, 'valor_liquidado', valor_liquidado
-      FROM "{schema}"."fato_despesa" WHERE valor_liquidado < 0
-      UNION ALL
-      SELECT 'fato_despesa', exercicio, entidade, 'valor_pago', valor_pago
-      FROM "{schema}"."fato_despesa" WHERE valor_pago < 0;
+    Detecta e depois detalha: COUNT(*) das violações (total p/ o SUMMARY) e, só se houver,
+    até `cap` linhas de detalhe ordenadas por (exercicio, entidade).
     """
-    df_d = df_query(engine, qd)
+    n = con.execute(text(f'SELECT COUNT(*) FROM "{schema}"."fato_despesa" WHERE {R1_VIOLACAO_SQL};')).scalar()
+    if not n:
+        return 0, pd.DataFrame(columns=["exercicio","entidade","valor_empenhado","valor_liquidado","valor_pago"])
+    sql = f"""
+      SELECT exercicio, entidade, valor_empenhado, valor_liquidado, valor_pago
+      FROM "{schema}"."fato_despesa"
+      WHERE {R1_VIOLACAO_SQL}
+      ORDER BY exercicio, entidade
+      LIMIT :cap;
+    """
+    return n, df_query(con, sql, {"cap": cap})
 
-    qr = f"""
-      SELECT 'fato_receita' AS tabela, exercicio, especificacao,
-             'previsao' AS campo, previsao AS valor
-      FROM "{schema}"."fato_receita" WHERE previsao < 0
+def r2_negatives(con, schema: str) -> pd.DataFrame:
+    # despesa e receita num único UNION ALL (colunas ausentes como NULL) — sem concat no pandas;
+    # cada fato é lido uma vez, com as métricas desempilhadas via LATERAL VALUES.
+    # whitelist de redutoras aplicada no servidor (especificacao normalizada como em norm_txt)
+    esp_norm = f"lower(translate(btrim(COALESCE(especificacao,''), E' \\t\\r\\n'), '{SQL_ACENTOS[0]}', '{SQL_ACENTOS[1]}'))"
+    sql = f"""
+      SELECT 'fato_despesa' AS tabela, d.exercicio, d.entidade, v.campo, v.valor, NULL::text AS especificacao
+      FROM "{schema}"."fato_despesa" d
+      CROSS JOIN LATERAL (VALUES
+        ('valor_empenhado', d.valor_empenhado),
+        ('valor_liquidado', d.valor_liquidado),
+        ('valor_pago',      d.valor_pago)
+      ) AS v(campo, valor)
+      WHERE v.valor < 0
       UNION ALL
-      SELECT 'fato_receita', exercicio, especificacao, 'arrecadacao', arrecadacao
-      FROM "{schema}"."fato_receita" WHERE arrecadacao < 0;
+      SELECT 'fato_receita', r.exercicio, NULL, v.campo, v.valor, r.especificacao
+      FROM "{schema}"."fato_receita" r
+      CROSS JOIN LATERAL (VALUES
+        ('previsao',    r.previsao),
+        ('arrecadacao', r.arrecadacao)
+      ) AS v(campo, valor)
+      WHERE v.valor < 0
+        AND {esp_norm} <> ALL(:allow);
     """
-    df_r = df_query(engine, qr)
-    if not df_r.empty:
-        df_r["_norm_espec"] = df_r["especificacao"].map(norm_txt)
-        df_r = df_r[~df_r["_norm_espec"].isin(NEG_RECEITA_ALLOW)]
-        df_r = df_r.drop(columns=["_norm_espec"])
-
-    frames = [d for d in (df_d, df_r) if not d.empty]
-    if not frames:
-        return pd.DataFrame(columns=["tabela","exercicio","entidade","especificacao","campo","valor"])
-    return pd.concat(frames, ignore_index=True)
-
-def r3_dups_staging(engine, schema_stg: str) -> pd.DataFrame:
-    frames = []
-    for t in STAGING_TABLES:
-        sql = f"""
-          SELECT '{t}' AS tabela, id_linha_hash, COUNT(*) AS qtd
-          FROM "{schema_stg}"."{t}"
-          GROUP BY id_linha_hash
-          HAVING COUNT(*) > 1;
-        """
-        try:
-            df = df_query(engine, sql)
-            if not df.empty:
-                frames.append(df)
-        except Exception:
-            pass
-    if not frames:
-        return pd.DataFrame(columns=["tabela","id_linha_hash","qtd"])
-    return pd.concat(frames, ignore_index=True)
+    return df_query(con, sql, {"allow": sorted({norm_txt(x) for x in NEG_RECEITA_ALLOW})})
 
-def r4_reconcile_facts_vs_staging(engine, schema: str, schema_stg: str, years: Optional[List[int]], thr: float) -> pd.DataFrame:
-    where_years = ""
-    params: Dict[str, Any] = {}
+def r3_dups_staging(con, schema_stg: str) -> pd.DataFrame:
+    # só tabelas existentes e com id_linha_hash (um lookup no catálogo), todas num único UNION ALL
+    prefetch_columns(con, schema_stg, STAGING_TABLES)
+    tabelas = [t for t in STAGING_TABLES if "id_linha_hash" in get_columns(con, schema_stg, t)]
+    if not tabelas:
+        return pd.DataFrame(columns=["tabela","id_linha_hash","qtd"])
+    sql = "\n      UNION ALL\n".join(f"""
+      SELECT '{t}' AS tabela, id_linha_hash, COUNT(*) AS qtd
+      FROM "{schema_stg}"."{t}"
+      GROUP BY id_linha_hash
+      HAVING COUNT(*) > 1""" for t in tabelas)
+    return df_query(con, sql)
+
+def r4_reconcile_facts_vs_staging(con, schema: str, schema_stg: str, years: Optional[List[int]], thr: float) -> pd.DataFrame:
+    params: Dict[str, Any] = {"thr": thr}
+    where_fato = ""
     if years:
-        where_years = "WHERE exercicio = ANY(:years)"
         params["years"] = years
-
-    # --- FATO DESPESA (por ano)
-    q_fd = f"""
-      SELECT exercicio,
-             SUM(COALESCE(valor_empenhado,0)) AS fato_empenhado,
-             SUM(COALESCE(valor_liquidado,0)) AS fato_liquidado,
-             SUM(COALESCE(valor_pago,0))      AS fato_pago
-      FROM "{schema}"."fato_despesa"
-      {where_years}
-      GROUP BY exercicio
-      ORDER BY exercicio;
-    """
-    fd = df_query(engine, q_fd, params)
+        where_fato = "WHERE exercicio = ANY(:years)"
 
     # Descobre a coluna de ano de cada staging e resolve colunas de valor dinamicamente
-    y_emp = year_col(engine, schema_stg, "stg_despesas_empenhadas")
-    y_liq = year_col(engine, schema_stg, "stg_despesas_liquidadas")
-    y_pag = year_col(engine, schema_stg, "stg_despesas_pagas")
-    y_rec = year_col(engine, schema_stg, "stg_receitas")
+    prefetch_columns(con, schema_stg, STAGING_TABLES)
+    y_emp = year_col(con, schema_stg, "stg_despesas_empenhadas")
+    y_liq = year_col(con, schema_stg, "stg_despesas_liquidadas")
+    y_pag = year_col(con, schema_stg, "stg_despesas_pagas")
+    y_rec = year_col(con, schema_stg, "stg_receitas")
+
+    amt = resolve_stg_amount_cols(con, schema_stg)
 
-    amt = resolve_stg_amount_cols(engine, schema_stg)
+    def stg_where(ycol: str) -> str:
+        return f"WHERE {year_key_sql(ycol)} = ANY(:years)" if years else ""
 
     # --- STAGING DESPESAS (por ano)
-    emp_val_expr = None
     if amt["emp_liquido"]:
-        emp_val_expr = to_numeric_sql(f'"{amt["emp_liquido"]}"')
+        emp_val_expr = numeric_expr(schema_stg, "stg_despesas_empenhadas", amt["emp_liquido"])
     elif amt["emp_empenhado"]:
-        emp_val_expr = to_numeric_sql(f'"{amt["emp_empenhado"]}"')
+        emp_val_expr = numeric_expr(schema_stg, "stg_despesas_empenhadas", amt["emp_empenhado"])
     else:
         emp_val_expr = "0::numeric"  # não encontrado
 
-    liq_orc_expr = to_numeric_sql(f'"{amt["liq_orc"]}"') if amt["liq_orc"] else "0::numeric"
-    liq_rap_expr = to_numeric_sql(f'"{amt["liq_rap"]}"') if amt["liq_rap"] else "0::numeric"
-    pag_orc_expr = to_numeric_sql(f'"{amt["pag_orc"]}"') if amt["pag_orc"] else "0::numeric"
-    pag_rap_expr = to_numeric_sql(f'"{amt["pag_rap"]}"') if amt["pag_rap"] else "0::numeric"
+    liq_orc_expr = numeric_expr(schema_stg, "stg_despesas_liquidadas", amt["liq_orc"]) if amt["liq_orc"] else "0::numeric"
+    liq_rap_expr = numeric_expr(schema_stg, "stg_despesas_liquidadas", amt["liq_rap"]) if amt["liq_rap"] else "0::numeric"
+    pag_orc_expr = numeric_expr(schema_stg, "stg_despesas_pagas", amt["pag_orc"]) if amt["pag_orc"] else "0::numeric"
+    pag_rap_expr = numeric_expr(schema_stg, "stg_despesas_pagas", amt["pag_rap"]) if amt["pag_rap"] else "0::numeric"
 
-    q_sd = f"""
-      WITH emp AS (
-        SELECT NULLIF("{y_emp}", '')::int AS ano,
-               SUM(COALESCE({emp_val_expr},0)) AS empenhado
+    # fatos x staging num único round-trip: FULL JOIN por exercicio, diferenças e limiar no servidor.
+    # diff fica NULL quando um dos lados não tem o ano (não sinaliza, como antes).
+    sql = f"""
+      WITH fd AS (
+        SELECT exercicio,
+               SUM(COALESCE(valor_empenhado,0)) AS fato_empenhado,
+               SUM(COALESCE(valor_liquidado,0)) AS fato_liquidado,
+               SUM(COALESCE(valor_pago,0))      AS fato_pago
+        FROM "{schema}"."fato_despesa"
+        {where_fato}
+        GROUP BY exercicio
+      ),
+      emp AS (
+        SELECT {year_key_sql(y_emp)} AS exercicio,
+               SUM(COALESCE({emp_val_expr},0)) AS stg_empenhado
         FROM "{schema_stg}"."stg_despesas_empenhadas"
+        {stg_where(y_emp)}
         GROUP BY 1
       ),
       liq AS (
-        SELECT NULLIF("{y_liq}", '')::int AS ano,
-               SUM(COALESCE({liq_orc_expr},0) + COALESCE({liq_rap_expr},0)) AS liquidado
+        SELECT {year_key_sql(y_liq)} AS exercicio,
+               SUM(COALESCE({liq_orc_expr},0) + COALESCE({liq_rap_expr},0)) AS stg_liquidado
         FROM "{schema_stg}"."stg_despesas_liquidadas"
+        {stg_where(y_liq)}
         GROUP BY 1
       ),
       pag AS (
-        SELECT NULLIF("{y_pag}", '')::int AS ano,
-               SUM(COALESCE({pag_orc_expr},0) + COALESCE({pag_rap_expr},0)) AS pago
+        SELECT {year_key_sql(y_pag)} AS exercicio,
+               SUM(COALESCE({pag_orc_expr},0) + COALESCE({pag_rap_expr},0)) AS stg_pago
         FROM "{schema_stg}"."stg_despesas_pagas"
+        {stg_where(y_pag)}
         GROUP BY 1
+      ),
+      fr AS (
+        SELECT exercicio,
+               SUM(COALESCE(previsao,0))    AS fato_previsao,
+               SUM(COALESCE(arrecadacao,0)) AS fato_arrecadacao
+        FROM "{schema}"."fato_receita"
+        {where_fato}
+        GROUP BY exercicio
+      ),
+      sr AS (
+        SELECT {year_key_sql(y_rec)} AS exercicio,
+               SUM(COALESCE({numeric_expr(schema_stg, "stg_receitas", "previsao")},0))    AS stg_previsao,
+               SUM(COALESCE({numeric_expr(schema_stg, "stg_receitas", "arrecadacao")},0)) AS stg_arrecadacao
+        FROM "{schema_stg}"."stg_receitas"
+        {stg_where(y_rec)}
+        GROUP BY 1
+      ),
+      j AS (
+        SELECT exercicio,
+               fato_empenhado, stg_empenhado, fato_liquidado, stg_liquidado,
+               fato_pago, stg_pago, fato_previsao, stg_previsao,
+               fato_arrecadacao, stg_arrecadacao,
+               ABS(fato_empenhado - stg_empenhado)     AS diff_emp,
+               ABS(fato_liquidado - stg_liquidado)     AS diff_liq,
+               ABS(fato_pago - stg_pago)               AS diff_pag,
+               ABS(fato_previsao - stg_previsao)       AS diff_prev,
+               ABS(fato_arrecadacao - stg_arrecadacao) AS diff_arr
+        FROM fd
+        FULL JOIN emp USING (exercicio)
+        FULL JOIN liq USING (exercicio)
+        FULL JOIN pag USING (exercicio)
+        FULL JOIN fr  USING (exercicio)
+        FULL JOIN sr  USING (exercicio)
       )
-      SELECT COALESCE(e.ano,l.ano,p.ano) AS exercicio,
-             e.empenhado, l.liquidado, p.pago
-      FROM emp e
-      FULL JOIN liq l ON l.ano = e.ano
-      FULL JOIN pag p ON p.ano = COALESCE(e.ano,l.ano)
-      ORDER BY 1;
-    """
-    sd = df_query(engine, q_sd)
-
-    # --- FATO RECEITA (por ano)
-    q_fr = f"""
-      SELECT exercicio,
-             SUM(COALESCE(previsao,0))    AS fato_previsao,
-             SUM(COALESCE(arrecadacao,0)) AS fato_arrecadacao
-      FROM "{schema}"."fato_receita"
-      {where_years}
-      GROUP BY exercicio
+      SELECT *
+      FROM j
+      WHERE COALESCE(GREATEST(diff_emp, diff_liq, diff_pag, diff_prev, diff_arr), 0) >= :thr
       ORDER BY exercicio;
     """
-    fr = df_query(engine, q_fr, params)
-
-    # --- STAGING RECEITA (por ano) — usa coluna dinâmica e conversão robusta
-    q_sr = f"""
-      SELECT NULLIF("{y_rec}", '')::int AS exercicio,
-             SUM(COALESCE({to_numeric_sql('"previsao"')},0))    AS stg_previsao,
-             SUM(COALESCE({to_numeric_sql('"arrecadacao"')},0)) AS stg_arrecadacao
-      FROM "{schema_stg}"."stg_receitas"
-      GROUP BY 1
-      ORDER BY 1;
-    """
-    sr = df_query(engine, q_sr)
-
-    # join e diferenças
-    out = []
-    anos = sorted(set(fd.get("exercicio", [])).union(sd.get("exercicio", [])).union(fr.get("exercicio", [])).union(sr.get("exercicio", [])))
-    if years:
-        anos = [y for y in anos if y in years]
+    return df_query(con, sql, params)
 
-    def gv(df: pd.DataFrame, y: int, col: str) -> float:
-        try:
-            return float(df.loc[df["exercicio"] == y, col].iloc[0])
-        except Exception:
-            return float("nan")
-
-    for y in anos:
-        linha = {
-            "exercicio": y,
-            "fato_empenhado": gv(fd, y, "fato_empenhado"),
-            "stg_empenhado": gv(sd, y, "empenhado"),
-            "fato_liquidado": gv(fd, y, "fato_liquidado"),
-            "stg_liquidado": gv(sd, y, "liquidado"),
-            "fato_pago": gv(fd, y, "fato_pago"),
-            "stg_pago": gv(sd, y, "pago"),
-            "fato_previsao": gv(fr, y, "fato_previsao"),
-            "stg_previsao": gv(sr, y, "stg_previsao"),
-            "fato_arrecadacao": gv(fr, y, "fato_arrecadacao"),
-            "stg_arrecadacao": gv(sr, y, "stg_arrecadacao"),
-        }
-        for a, b, name in [
-            ("fato_empenhado","stg_empenhado","diff_emp"),
-            ("fato_liquidado","stg_liquidado","diff_liq"),
-            ("fato_pago","stg_pago","diff_pag"),
-            ("fato_previsao","stg_previsao","diff_prev"),
-            ("fato_arrecadacao","stg_arrecadacao","diff_arr"),
-        ]:
-            va, vb = linha[a], linha[b]
-            linha[name] = abs(va - vb) if pd.notna(va) and pd.notna(vb) else None
-        out.append(linha)
-
-    df = pd.DataFrame(out)
-    if not df.empty:
-        cols_diff = ["diff_emp","diff_liq","diff_pag","diff_prev","diff_arr"]
-        mask = False
-        for c in cols_diff:
-            mask = (mask | (df[c].fillna(0) >= thr)) if isinstance(mask, pd.Series) else (df[c].fillna(0) >= thr)
-        df = df[mask] if isinstance(mask, pd.Series) else df
-    return df
-
-def r5_year_coverage(engine, schema: str, years: Optional[List[int]]) -> pd.DataFrame:
+def r5_year_coverage(con, schema: str, years: Optional[List[int]]) -> pd.DataFrame:
     if not years:
         return pd.DataFrame(columns=["tabela","ano_ausente"])
-    q1 = f'SELECT DISTINCT exercicio FROM "{schema}"."fato_despesa";'
-    q2 = f'SELECT DISTINCT exercicio FROM "{schema}"."fato_receita";'
-    fd = set(df_query(engine, q1)["exercicio"].tolist())
-    fr = set(df_query(engine, q2)["exercicio"].tolist())
-    rows = []
-    for y in years:
-        if y not in fd: rows.append({"tabela":"fato_despesa","ano_ausente":y})
-        if y not in fr: rows.append({"tabela":"fato_receita","ano_ausente":y})
-    return pd.DataFrame(rows, columns=["tabela","ano_ausente"])
-
-def r6_yoy_anomalies(engine, schema: str, yoy_thr: float) -> pd.DataFrame:
-    qd = f"""
-      WITH agg AS (
+    # anti-join no servidor; unnest (e não generate_series) porque --years aceita lista não contígua
+    sql = f"""
+      SELECT tabela, ano_ausente
+      FROM (
+        SELECT 'fato_despesa' AS tabela, y.ano AS ano_ausente, y.ord, 1 AS o
+        FROM unnest(CAST(:years AS int[])) WITH ORDINALITY AS y(ano, ord)
+        WHERE NOT EXISTS (SELECT 1 FROM "{schema}"."fato_despesa" d WHERE d.exercicio = y.ano)
+        UNION ALL
+        SELECT 'fato_receita', y.ano, y.ord, 2
+        FROM unnest(CAST(:years AS int[])) WITH ORDINALITY AS y(ano, ord)
+        WHERE NOT EXISTS (SELECT 1 FROM "{schema}"."fato_receita" r WHERE r.exercicio = y.ano)
+      ) a
+      ORDER BY ord, o;
+    """
+    return df_query(con, sql, {"years": years})
+
+def r6_yoy_anomalies(con, schema: str, yoy_thr: float) -> pd.DataFrame:
+    # uma linha por (métrica, exercicio) via LATERAL VALUES; LAG por métrica e limiar no servidor.
+    # float8 reproduz a aritmética do cálculo anterior em Python.
+    sql = f"""
+      WITH d AS (
         SELECT exercicio,
                SUM(valor_empenhado) AS v_emp,
                SUM(valor_liquidado) AS v_liq,
@@ -469,82 +528,101 @@ def r6_yoy_anomalies(engine, schema: str, yoy_thr: float) -> pd.DataFrame:
         GROUP BY exercicio
       ),
       r AS (
-        SELECT a.exercicio,
-               a.v_emp, a.v_liq, a.v_pag,
-               LAG(a.v_emp) OVER (ORDER BY a.exercicio) AS v_emp_prev,
-               LAG(a.v_liq) OVER (ORDER BY a.exercicio) AS v_liq_prev,
-               LAG(a.v_pag) OVER (ORDER BY a.exercicio) AS v_pag_prev
-        FROM agg a
-      )
-      SELECT exercicio,
-             v_emp, v_emp_prev,
-             v_liq, v_liq_prev,
-             v_pag, v_pag_prev
-      FROM r
-      ORDER BY exercicio;
-    """
-    d = df_query(engine, qd)
-
-    qr = f"""
-      WITH agg AS (
         SELECT exercicio,
                SUM(previsao)    AS v_prev,
                SUM(arrecadacao) AS v_arr
         FROM "{schema}"."fato_receita"
         GROUP BY exercicio
       ),
-      r AS (
-        SELECT a.exercicio,
-               a.v_prev, a.v_arr,
-               LAG(a.v_prev) OVER (ORDER BY a.exercicio) AS v_prev_prev,
-               LAG(a.v_arr) OVER (ORDER BY a.exercicio) AS v_arr_prev
-        FROM agg a
+      m AS (
+        SELECT d.exercicio, v.ord, v.tabela, v.valor::float8 AS valor
+        FROM d CROSS JOIN LATERAL (VALUES
+          (1, 'fato_despesa_empenhado', d.v_emp),
+          (2, 'fato_despesa_liquidado', d.v_liq),
+          (3, 'fato_despesa_pago',      d.v_pag)
+        ) AS v(ord, tabela, valor)
+        UNION ALL
+        SELECT r.exercicio, v.ord, v.tabela, v.valor::float8
+        FROM r CROSS JOIN LATERAL (VALUES
+          (4, 'fato_receita_previsao',    r.v_prev),
+          (5, 'fato_receita_arrecadacao', r.v_arr)
+        ) AS v(ord, tabela, valor)
+      ),
+      y AS (
+        SELECT ord, tabela, exercicio, valor,
+               LAG(valor) OVER (PARTITION BY ord ORDER BY exercicio) AS valor_ano_anterior
+        FROM m
       )
-      SELECT exercicio,
-             v_prev, v_prev_prev,
-             v_arr,  v_arr_prev
-      FROM r
-      ORDER BY exercicio;
+      SELECT tabela, exercicio,
+             ABS((valor - valor_ano_anterior) / valor_ano_anterior) AS yoy_abs,
+             valor, valor_ano_anterior
+      FROM y
+      WHERE valor_ano_anterior <> 0
+        AND ABS((valor - valor_ano_anterior) / valor_ano_anterior) >= :thr
+      ORDER BY ord, exercicio;
     """
-    r = df_query(engine, qr)
+    return df_query(con, sql, {"thr": yoy_thr})
 
-    rows = []
+def r7_total_rows_in_receita(con, schema_stg: str, path: Path) -> int:
+    """
+    Linhas 'TOTAL' do stg_receitas direto para CSV via COPY ... TO STDOUT (sem DataFrame).
+    Grava em <arquivo>.part e só publica o relatório se houver linhas; retorna a quantidade.
+    """
+    cols = get_columns(con, schema_stg, "stg_receitas")
+    if not {"codigo", "especificacao"} <= set(cols):
+        return 0
+    sel = ", ".join(f'"{c}"' for c in cols if not c.endswith(NUM_SUFFIX))
+    sql = f"""
+      COPY (
+        SELECT {sel}
+        FROM "{schema_stg}"."stg_receitas"
+        WHERE codigo ILIKE 'total'
+           OR especificacao ILIKE 'total'
+      ) TO STDOUT WITH (FORMAT csv, HEADER, ENCODING 'UTF8')
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".part")
+    cur = con.connection.cursor()  # cursor DBAPI da mesma transação/snapshot
+    try:
+        with open(tmp, "wb") as fh:
+            cur.copy_expert(sql, fh)
+        n = cur.rowcount
+    finally:
+        cur.close()
+    if n > 0:
+        tmp.replace(path)
+    else:
+        tmp.unlink()
+    return max(n, 0)
 
-    def check(df, cur, prev, label):
-        for _, row in df.iterrows():
-            v = row[cur]; p = row[prev]
-            if pd.notna(v) and pd.notna(p) and p != 0:
-                yoy = abs((v - p) / p)
-                if yoy >= yoy_thr:
-                    rows.append({"tabela": label, "exercicio": int(row["exercicio"]), "yoy_abs": float(yoy), "valor": float(v), "valor_ano_anterior": float(p)})
+# ================= Execução =================
 
-    if not d.empty:
-        check(d, "v_emp", "v_emp_prev", "fato_despesa_empenhado")
-        check(d, "v_liq", "v_liq_prev", "fato_despesa_liquidado")
-        check(d, "v_pag", "v_pag_prev", "fato_despesa_pago")
-    if not r.empty:
-        check(r, "v_prev", "v_prev_prev", "fato_receita_previsao")
-        check(r, "v_arr",  "v_arr_prev",  "fato_receita_arrecadacao")
+def run_rules(engine, jobs: Dict[str, Tuple[Any, tuple]], workers: int) -> Dict[str, Any]:
+    """
+    Executa as regras (nome -> (função, args)) em transações READ ONLY / REPEATABLE READ.
+    Com workers > 1 cada regra roda numa thread com conexão própria, importando o snapshot
+    exportado pela conexão principal (pg_export_snapshot) — os dados vistos são os mesmos
+    da execução serial.
+    """
+    ro = {"isolation_level": "REPEATABLE READ", "postgresql_readonly": True}
+    with engine.connect().execution_options(**ro) as main_con:
+        if workers <= 1:
+            return {k: fn(main_con, *a) for k, (fn, a) in jobs.items()}
+        snap = main_con.execute(text("SELECT pg_export_snapshot()")).scalar()
 
-    return pd.DataFrame(rows, columns=["tabela","exercicio","yoy_abs","valor","valor_ano_anterior"])
+        def run(fn, a):
+            with engine.connect().execution_options(**ro) as con:
+                con.execute(text(f"SET TRANSACTION SNAPSHOT '{snap}'"))
+                return fn(con, *a)
 
-def r7_total_rows_in_receita(engine, schema_stg: str) -> pd.DataFrame:
-    sql = f"""
-      SELECT *
-      FROM "{schema_stg}"."stg_receitas"
-      WHERE UPPER(COALESCE(codigo, '')) = 'TOTAL'
-         OR UPPER(COALESCE(especificacao, '')) = 'TOTAL';
-    """
-    try:
-        df = df_query(engine, sql)
-    except Exception:
-        df = pd.DataFrame()
-    return df
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            futs = {k: ex.submit(run, fn, a) for k, (fn, a) in jobs.items()}
+            return {k: f.result() for k, f in futs.items()}
 
 # ================= Main =================
 
 def main():
-    global VERBOSE
+    global VERBOSE, USE_NUMERIC_FN
 
     ap = argparse.ArgumentParser()
     ap.add_argument("--schema", default="public")
@@ -553,6 +631,11 @@ def main():
     ap.add_argument("--outdir", default="outputs/quality")
     ap.add_argument("--reconcile-threshold", type=float, default=1.0, help="mínimo abs. p/ sinalizar difs em R4")
     ap.add_argument("--yoy-threshold", type=float, default=0.30, help="limiar YoY (ex.: 0.30 = 30%) em R6")
+    ap.add_argument("--index-staging", action="store_true", help="cria índice de expressão no ano de cada staging (admin)")
+    ap.add_argument("--materialize-values", action="store_true", help="adiciona colunas geradas <col>__num nas colunas de valor do staging (admin)")
+    ap.add_argument("--index-facts", action="store_true", help="cria índice parcial das violações do R1 em fato_despesa (admin)")
+    ap.add_argument("--r1-cap", type=int, default=10_000, help="máximo de linhas de detalhe no relatório do R1")
+    ap.add_argument("--workers", type=int, default=7, help="regras executadas em paralelo (1 = serial)")
     ap.add_argument("--verbose", action="store_true")
     args = ap.parse_args()
 
@@ -564,50 +647,73 @@ def main():
 
     reports = []
 
-    # R1
-    r1 = r1_inequalities(engine, args.schema)
-    if not r1.empty:
+    # a função é criada/atualizada pelo 07; aqui só é usada se o corpo conferir (senão, mesma expressão inline)
+    with engine.connect() as con:
+        USE_NUMERIC_FN = numeric_fn_body(con, args.staging) == NUMERIC_FN_BODY
+    if not USE_NUMERIC_FN:
+        print(f"⚠️ {args.staging}.{NUMERIC_FN} ausente ou desatualizada (rode o 07); usando conversão inline.")
+
+    if args.index_staging or args.materialize_values:
+        if args.materialize_values and not USE_NUMERIC_FN:
+            print(f"⚠️ --materialize-values requer {args.staging}.{NUMERIC_FN}; ignorado.")
+        with engine.begin() as con:
+            migrate_staging(con, args.staging, args.index_staging, args.materialize_values and USE_NUMERIC_FN)
+
+    if args.index_facts:
+        with engine.begin() as con:
+            ensure_r1_index(con, args.schema)
+
+    # Regras são independentes: rodam em paralelo sobre o mesmo snapshot
+    res = run_rules(engine, {
+        "R1": (r1_inequalities, (args.schema, args.r1_cap)),
+        "R2": (r2_negatives, (args.schema,)),
+        "R3": (r3_dups_staging, (args.staging,)),
+        "R4": (r4_reconcile_facts_vs_staging, (args.schema, args.staging, years, args.reconcile_threshold)),
+        "R5": (r5_year_coverage, (args.schema, years)),
+        "R6": (r6_yoy_anomalies, (args.schema, args.yoy_threshold)),
+        "R7": (r7_total_rows_in_receita, (args.staging, outdir / "R7_receita_linhas_TOTAL.csv")),
+    }, args.workers)
+    (r1_n, r1), r2, r3, r4, r5, r6, r7 = (res[k] for k in ("R1", "R2", "R3", "R4", "R5", "R6", "R7"))
+
+    # R1 (SUMMARY com o total; CSV limitado a --r1-cap linhas)
+    if r1_n:
         CRITICAL_FLAGS.append("R1")
         save_report(r1, outdir / "R1_inequalities.csv")
-        reports.append(("R1", len(r1)))
+        if r1_n > len(r1):
+            print(f"⚠️ R1: {r1_n} violações; relatório com as primeiras {len(r1)} (--r1-cap).")
+        reports.append(("R1", r1_n))
 
     # R2
-    r2 = r2_negatives(engine, args.schema)
     if not r2.empty:
         CRITICAL_FLAGS.append("R2")
         save_report(r2, outdir / "R2_negativos.csv")
         reports.append(("R2", len(r2)))
 
     # R3
-    r3 = r3_dups_staging(engine, args.staging)
     if not r3.empty:
         save_report(r3, outdir / "R3_duplicatas_staging.csv")
         reports.append(("R3", len(r3)))
 
     # R4
-    r4 = r4_reconcile_facts_vs_staging(engine, args.schema, args.staging, years, args.reconcile_threshold)
     if not r4.empty:
         CRITICAL_FLAGS.append("R4")
         save_report(r4, outdir / "R4_reconcile_fatos_vs_staging.csv")
         reports.append(("R4", len(r4)))
 
     # R5
-    r5 = r5_year_coverage(engine, args.schema, years)
     if not r5.empty:
         save_report(r5, outdir / "R5_cobertura_anos.csv")
         reports.append(("R5", len(r5)))
 
     # R6
-    r6 = r6_yoy_anomalies(engine, args.schema, args.yoy_threshold)
     if not r6.empty:
         save_report(r6, outdir / "R6_yoy_anomalias.csv")
         reports.append(("R6", len(r6)))
 
-    # R7
-    r7 = r7_total_rows_in_receita(engine, args.staging)
-    if not r7.empty:
-        save_report(r7, outdir / "R7_receita_linhas_TOTAL.csv")
-        reports.append(("R7", len(r7)))
+    # R7 (já gravado pelo COPY)
+    if r7:
+        print(f"📝 Relatório salvo: {outdir / 'R7_receita_linhas_TOTAL.csv'}")
+        reports.append(("R7", r7))
 
     # Summary
     if reports:
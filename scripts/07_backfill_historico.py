@@ -9,8 +9,9 @@ Fluxo:
   2) Resolve dinamicamente nomes de colunas (ano, entidade, especificação e valores).
   3) Deleta dos Fatos os anos-alvo (--years).
   4) (Despesa) Agrega Empenhado, Liquidado (Orçamento + RAP) e Pago (Orçamento + RAP) por (exercicio, entidade).
+     (UNION ALL das 3 stagings + um único GROUP BY)
   5) (Receita) Agrega Previsão e Arrecadação por (exercicio, especificacao).
-  6) Insere nos Fatos.
+  6) Insere nos Fatos (INSERT ... ON CONFLICT sobre o índice UNIQUE do grão: execução idempotente).
   7) (Opcional) VACUUM/ANALYZE (VACUUM fora de transação/autocommit).
 
 Uso:
@@ -21,11 +22,14 @@ Uso:
     --years 2018-2025 \
     --vacuum \
     --analyze \
+    --audit \
     --verbose
 
 Observações:
-- Script transacional para os passos de DELETE/INSERT (rollback em falhas).
-- Conversão numérica robusta (pt-BR/US; negativos entre parênteses) aplicada no SQL.
+- DELETE/INSERT transacionais, uma transação por fato (rollback em falhas daquele fato),
+  com lock_timeout para não ficar preso atrás de escritas na staging.
+- Conversão numérica robusta (pt-BR/US; negativos entre parênteses) aplicada no SQL
+  via função IMMUTABLE <staging>.stg_to_numeric(text), criada a cada execução.
 - Falha explícita se faltar coluna essencial (ano/entidade/especificação/valores).
 """
 
@@ -33,20 +37,27 @@ import argparse
 import os
 import sys
 import unicodedata
-from typing import Dict, List, Optional
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 
 from sqlalchemy import create_engine, text
 from sqlalchemy.engine import Connection
 
 # ========================= Utils / Infra =========================
 
+# Remove diacríticos combinantes (bloco U+0300–U+036F) via str.translate, em C
+_STRIP_MARKS = dict.fromkeys(range(0x0300, 0x0370))
+
+@lru_cache(maxsize=4096)
 def norm_txt(s: str) -> str:
     if s is None:
         return ""
     s = s.strip().lower()
-    s = "".join(c for c in unicodedata.normalize("NFD", s) if unicodedata.category(c) != "Mn")
-    return s
+    if s.isascii():
+        return s
+    return unicodedata.normalize("NFD", s).translate(_STRIP_MARKS)
 
+@lru_cache(maxsize=4096)
 def norm_key(s: str) -> str:
     s = norm_txt(s)
     return "".join(ch if ch.isalnum() else "_" for ch in s)
@@ -66,6 +77,17 @@ def parse_years(arg: Optional[str]) -> List[int]:
         raise SystemExit("❌ Formato inválido para --years")
     return years
 
+def qi(name: str) -> str:
+    """Identificador SQL entre aspas, escapando aspas internas (equivale a psycopg2.sql.Identifier)."""
+    return '"' + name.replace('"', '""') + '"'
+
+def years_filter_sql(years: List[int]) -> str:
+    """Predicado de anos: BETWEEN se a lista for contígua (poda por faixa), senão IN (...)."""
+    ys = sorted(set(years))
+    if ys[-1] - ys[0] == len(ys) - 1:
+        return f"BETWEEN {ys[0]} AND {ys[-1]}"
+    return "IN (" + ",".join(str(y) for y in ys) + ")"
+
 def eng_from_env():
     url = os.getenv("DATABASE_URL")
     if not url:
@@ -75,66 +97,111 @@ def eng_from_env():
     url = url.replace("postgresql+psycopg2://", "postgresql://")
     return create_engine(url, future=True)
 
-def to_numeric_sql(col_q: str) -> str:
+# Texto pt-BR/US → numeric ({s} = expressão de texto). Sem dígitos ('', '-', '.', NULL) → 0;
+# vírgula presente → pt-BR (translate tira os pontos de milhar e troca vírgula por ponto);
+# sem vírgula e com mais de um ponto → pontos de milhar ('1.234.567'); parênteses e '-' no
+# início ou no fim ('1.234,56-') → negativo. O que sobrar inválido (ex.: '1,2,3', '2024-01-01')
+# falha no cast em vez de virar 0 em silêncio.
+NUMERIC_EXPR = """CASE WHEN {s} IS NULL OR {s} !~ '[0-9]' THEN 0::numeric
+     ELSE CASE WHEN left({s}, 1) = '(' AND right({s}, 1) = ')' THEN -1 ELSE 1 END
+        * CASE WHEN {s} ~ '^[^0-9]*-' OR {s} ~ '-[^0-9]*$' THEN -1 ELSE 1 END
+        * CASE WHEN {s} ~ '[0-9][^0-9]*-[^0-9]*[0-9]' THEN {s}::numeric
+               WHEN position(',' in {s}) > 0 THEN translate(REGEXP_REPLACE({s}, '[^0-9,.]', '', 'g'), ',.', '.')::numeric
+               WHEN {s} ~ '[.].*[.]' THEN REGEXP_REPLACE({s}, '[^0-9]', '', 'g')::numeric
+               ELSE REGEXP_REPLACE({s}, '[^0-9.]', '', 'g')::numeric END
+END"""
+
+NUMERIC_FN = "stg_to_numeric"
+NUMERIC_FN_BODY = f"SELECT {NUMERIC_EXPR.format(s='s')}"
+LOCK_TIMEOUT = "5s"
+IDLE_TX_TIMEOUT = "60s"
+
+def numeric_fn_body(con, schema: str) -> Optional[str]:
+    """Corpo instalado de <schema>.stg_to_numeric(text), ou None se a função não existe."""
+    body = con.execute(text("SELECT prosrc FROM pg_proc WHERE oid = to_regprocedure(:fn)"),
+                       {"fn": f"{qi(schema)}.{NUMERIC_FN}(text)"}).scalar()
+    return body.strip() if body is not None else None
+
+def ensure_numeric_fn(con, schema: str) -> None:
     """
-    Conversor SQL robusto pt-BR/US:
-      - vírgula => trata como pt-BR (remove pontos, vírgula->ponto)
-      - parênteses => negativo  (123,45) -> -123.45
-      - caracteres não numéricos removidos
-    """
-    return f"""
-    (
-      CASE
-        WHEN {col_q} IS NULL OR {col_q} = '' THEN 0::numeric
-        ELSE
-          (CASE WHEN {col_q} LIKE '(%%' AND {col_q} LIKE '%%)' THEN -1 ELSE 1 END) *
-          (
-            CASE
-              WHEN {col_q} LIKE '%%,%%' THEN
-                NULLIF(
-                  REPLACE(
-                    REPLACE(
-                      REGEXP_REPLACE({col_q}, '[^0-9,().-]', '', 'g'),
-                    '.', ''), ',', '.'
-                  ),
-                '')::numeric
-              ELSE
-                NULLIF(
-                  REGEXP_REPLACE({col_q}, '[^0-9().-]', '', 'g'),
-                '')::numeric
-            END
-          )
-      END
-    )
+    Cria a função IMMUTABLE de conversão texto → numeric usada pelos builders (numeric_fn_sql),
+    para não repetir o CASE/REGEXP por coluna. O 07 é o dono da função: cria se falta e só
+    regrava se o corpo instalado difere de NUMERIC_FN_BODY (sem DDL numa execução comum);
+    o 06 apenas a usa quando o corpo confere.
+    Regras em NUMERIC_EXPR: sem dígitos vira 0 (dispensa COALESCE nos builders); milhar sem
+    vírgula e '-' no fim são convertidos; texto inválido com dígitos falha no cast.
+    LANGUAGE sql com um único SELECT sem FROM: o planner faz inline da expressão na consulta,
+    sem a chamada PL/pgSQL por linha.
     """
+    if numeric_fn_body(con, schema) == NUMERIC_FN_BODY:
+        return
+    con.execute(text(f"""
+    CREATE OR REPLACE FUNCTION {qi(schema)}.{NUMERIC_FN}(s text) RETURNS numeric
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+      {NUMERIC_FN_BODY}
+    $$;
+    """))
+
+def numeric_fn_sql(schema: str, col: str) -> str:
+    return f'{qi(schema)}.{NUMERIC_FN}({qi(col)})'
+
+_COLS_CACHE: Dict[Tuple[str, str], List[str]] = {}
 
 def get_columns(con, schema: str, table: str) -> List[str]:
+    """Colunas da tabela (memoizado por (schema, tabela) durante a execução)."""
+    key = (schema, table)
+    if key not in _COLS_CACHE:
+        prefetch_columns(con, schema, [table])
+    return _COLS_CACHE[key]
+
+def prefetch_columns(con, schema: str, tables: List[str]) -> None:
+    """Carrega no cache as colunas de várias tabelas com uma única consulta ao catálogo."""
+    # pg_attribute direto (lookup por índice) em vez de information_schema.columns
     sql = """
-      SELECT column_name
-      FROM information_schema.columns
-      WHERE table_schema = :s AND table_name = :t
-      ORDER BY ordinal_position;
+      SELECT c.relname, a.attname
+      FROM pg_attribute a
+      JOIN pg_class c     ON c.oid = a.attrelid
+      JOIN pg_namespace n ON n.oid = c.relnamespace
+      WHERE n.nspname = :s AND c.relname = ANY(:ts) AND a.attnum > 0 AND NOT a.attisdropped
+      ORDER BY c.relname, a.attnum;
     """
-    rows = con.execute(text(sql), {"s": schema, "t": table}).fetchall()
-    return [r[0] for r in rows]
-
-def find_col_exact_or_prefix(cols: List[str], candidates: List[str]) -> Optional[str]:
-    cmap = {norm_txt(c): c for c in cols}
+    out: Dict[str, List[str]] = {t: [] for t in tables}
+    for t, c in con.execute(text(sql), {"s": schema, "ts": list(tables)}).fetchall():
+        out[t].append(c)
+    for t, cols in out.items():
+        _COLS_CACHE[(schema, t)] = cols
+
+def norm_candidates(*cands: str) -> Tuple[str, ...]:
+    return tuple(dict.fromkeys(norm_txt(c) for c in cands))
+
+# Candidatos já normalizados (uma vez, no import)
+YEAR_KEYS = norm_candidates("exercicio", "ano")
+ENTIDADE_KEYS = norm_candidates("entidade", "orgão", "orgao", "unidade_orcamentaria", "unidade orcamentaria", "unidade")
+ESPEC_KEYS = norm_candidates("especificacao", "especificação", "descricao", "descrição")
+PREV_KEYS = norm_candidates("previsao", "previsão")
+ARR_KEYS = norm_candidates("arrecadacao", "arrecadação")
+
+@lru_cache(maxsize=64)
+def _col_maps(cols: Tuple[str, ...]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """Mapas normalizados de uma tabela (norm_txt -> col, col -> norm_key), montados uma vez por lista de colunas."""
+    return {norm_txt(c): c for c in cols}, {c: norm_key(c) for c in cols}
+
+def find_col_exact_or_prefix(cols: List[str], keys: Tuple[str, ...]) -> Optional[str]:
+    """keys: candidatos já normalizados (ver norm_candidates)."""
+    cmap = _col_maps(tuple(cols))[0]
     # exato
-    for cand in candidates:
-        k = norm_txt(cand)
+    for k in keys:
         if k in cmap:
             return cmap[k]
     # prefixo
-    for cand in candidates:
-        k = norm_txt(cand)
+    for k in keys:
         for nk, v in cmap.items():
             if nk.startswith(k):
                 return v
     return None
 
 def find_col_contains(cols: List[str], terms: List[str]) -> Optional[str]:
-    nmap = {c: norm_key(c) for c in cols}
+    nmap = _col_maps(tuple(cols))[1]
     for col, nk in nmap.items():
         if all(t in nk for t in terms):
             return col
@@ -144,30 +211,30 @@ def find_col_contains(cols: List[str], terms: List[str]) -> Optional[str]:
 
 def resolve_year_col(con, schema: str, table: str) -> str:
     cols = get_columns(con, schema, table)
-    y = find_col_exact_or_prefix(cols, ["exercicio", "ano"])
+    y = find_col_exact_or_prefix(cols, YEAR_KEYS)
     if not y:
         raise RuntimeError(f"Coluna de ano não encontrada em {schema}.{table}. Colunas: {cols}")
     return y
 
 def resolve_entidade_col(con, schema: str, table: str) -> str:
     cols = get_columns(con, schema, table)
-    cand = find_col_exact_or_prefix(cols, ["entidade", "orgão", "orgao", "unidade_orcamentaria", "unidade orcamentaria", "unidade"])
+    cand = find_col_exact_or_prefix(cols, ENTIDADE_KEYS)
     if not cand:
         raise RuntimeError(f"Coluna de entidade não encontrada em {schema}.{table}. Colunas: {cols}")
     return cand
 
 def resolve_receita_cols(con, schema: str) -> Dict[str, str]:
     cols = get_columns(con, schema, "stg_receitas")
-    y = find_col_exact_or_prefix(cols, ["exercicio", "ano"])
+    y = find_col_exact_or_prefix(cols, YEAR_KEYS)
     if not y:
         raise RuntimeError(f"Coluna de ano não encontrada em {schema}.stg_receitas. Colunas: {cols}")
 
-    espec = find_col_exact_or_prefix(cols, ["especificacao", "especificação", "descricao", "descrição"])
+    espec = find_col_exact_or_prefix(cols, ESPEC_KEYS)
     if not espec:
         raise RuntimeError(f"Coluna de especificação não encontrada em {schema}.stg_receitas. Colunas: {cols}")
 
-    prev = find_col_exact_or_prefix(cols, ["previsao", "previsão"])
-    arr  = find_col_exact_or_prefix(cols, ["arrecadacao", "arrecadação"])
+    prev = find_col_exact_or_prefix(cols, PREV_KEYS)
+    arr  = find_col_exact_or_prefix(cols, ARR_KEYS)
 
     if not prev or not arr:
         raise RuntimeError(f"Colunas de valores (previsao/arrecadacao) não encontradas em {schema}.stg_receitas. Colunas: {cols}")
@@ -201,111 +268,347 @@ def resolve_despesa_value_cols(con, schema: str) -> Dict[str, Optional[str]]:
 
     return out
 
+# ========================= Staging particionada (opcional) =========================
+
+def year_key_sql(year_col: str) -> str:
+    return f"(NULLIF({qi(year_col)}, '')::int)"
+
+def attach_new_year_partitions(con, schema: str, table: str, year_col: str, verbose: bool = False) -> None:
+    """
+    Staging já particionada: anos que chegaram depois da migração (04) caem na DEFAULT. Cria a
+    partição de cada um e move as linhas (DEFAULT destacada durante a troca, depois reanexada).
+    """
+    key = year_key_sql(year_col)
+    q, dflt = f"{qi(schema)}.{qi(table)}", f"{qi(schema)}.{qi(f'{table}_default')}"
+    if con.execute(text("SELECT to_regclass(:q)"), {"q": dflt}).scalar() is None:
+        return
+    years = sorted(r[0] for r in con.execute(text(f"SELECT DISTINCT {key} FROM {dflt} WHERE {key} IS NOT NULL")).fetchall())
+    if not years:
+        return
+    cols = ", ".join(qi(c) for c in insertable_columns(con, q))
+    in_years = ", ".join(str(int(y)) for y in years)
+    con.execute(text(f"ALTER TABLE {q} DETACH PARTITION {dflt};"))
+    for y in years:
+        con.execute(text(f"CREATE TABLE {qi(schema)}.{qi(f'{table}_{y}')} PARTITION OF {q} FOR VALUES IN ({int(y)});"))
+    con.execute(text(f"INSERT INTO {q} ({cols}) SELECT {cols} FROM {dflt} WHERE {key} IN ({in_years});"))
+    con.execute(text(f"DELETE FROM {dflt} WHERE {key} IN ({in_years});"))
+    con.execute(text(f"ALTER TABLE {q} ATTACH PARTITION {dflt} DEFAULT;"))
+    if verbose:
+        print(f"🧩 {schema}.{table}: +{len(years)} partições ({in_years}) movidas da default.")
+
+def insertable_columns(con, q: str) -> List[str]:
+    """Colunas da tabela que aceitam INSERT (exclui colunas geradas, ex.: <col>__num do 06)."""
+    return [r[0] for r in con.execute(text("""
+      SELECT attname FROM pg_attribute
+      WHERE attrelid = to_regclass(:q) AND attnum > 0 AND NOT attisdropped AND attgenerated = ''
+      ORDER BY attnum
+    """), {"q": q}).fetchall()]
+
+def ensure_staging_partitioned(con, schema: str, table: str, year_col: str, verbose: bool = False) -> None:
+    """
+    Migração (admin): recria a staging como PARTITION BY LIST (NULLIF(ano,'')::int),
+    uma partição por ano + DEFAULT. O filtro de anos dos builders usa a mesma expressão,
+    então o planner poda partições e pode agregar por partição.
+    Índices (04/05/06), dono e GRANTs da tabela original são recriados na particionada;
+    índices UNIQUE sem a chave de partição não são aceitos pelo Postgres e são avisados.
+    Tabelas já particionadas: só ganham as partições dos anos que caíram na DEFAULT.
+    Tabelas com views dependentes são ignoradas (o rename deixaria as views na tabela antiga).
+    """
+    q = f"{qi(schema)}.{qi(table)}"
+    kind = con.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:q)"), {"q": q}).scalar()
+    if kind == "p":
+        attach_new_year_partitions(con, schema, table, year_col, verbose)
+        return
+    if kind != "r":
+        return
+    has_views = con.execute(text("""
+      SELECT EXISTS (
+        SELECT 1 FROM pg_depend d JOIN pg_rewrite r ON r.oid = d.objid
+        WHERE d.classid = 'pg_rewrite'::regclass AND d.refobjid = to_regclass(:q) AND r.ev_class <> d.refobjid
+      )
+    """), {"q": q}).scalar()
+    if has_views:
+        print(f"⚠️ {schema}.{table} tem views dependentes; não particionada.")
+        return
+
+    # o que o DROP levaria junto: índices, dono e GRANTs
+    index_defs = [r[0] for r in con.execute(text("""
+      SELECT pg_get_indexdef(indexrelid) FROM pg_index WHERE indrelid = to_regclass(:q)
+    """), {"q": q}).fetchall()]
+    owner = con.execute(text("SELECT pg_get_userbyid(relowner) FROM pg_class WHERE oid = to_regclass(:q)"), {"q": q}).scalar()
+    grants = con.execute(text("""
+      SELECT a.privilege_type, CASE WHEN a.grantee = 0 THEN 'PUBLIC' ELSE quote_ident(pg_get_userbyid(a.grantee)) END
+      FROM pg_class c, aclexplode(c.relacl) a
+      WHERE c.oid = to_regclass(:q) AND a.grantee <> c.relowner
+    """), {"q": q}).fetchall()
+
+    key = year_key_sql(year_col)
+    tmp = f"{table}__part"
+    cols = ", ".join(qi(c) for c in insertable_columns(con, q))
+    con.execute(text(f"CREATE TABLE {qi(schema)}.{qi(tmp)} (LIKE {q} INCLUDING ALL EXCLUDING INDEXES) PARTITION BY LIST ({key});"))
+    years = [r[0] for r in con.execute(text(f"SELECT DISTINCT {key} FROM {q} WHERE {key} IS NOT NULL")).fetchall()]
+    for y in sorted(years):
+        con.execute(text(f"CREATE TABLE {qi(schema)}.{qi(f'{table}_{y}')} PARTITION OF {qi(schema)}.{qi(tmp)} FOR VALUES IN ({int(y)});"))
+    con.execute(text(f"CREATE TABLE {qi(schema)}.{qi(f'{table}_default')} PARTITION OF {qi(schema)}.{qi(tmp)} DEFAULT;"))
+    con.execute(text(f"INSERT INTO {qi(schema)}.{qi(tmp)} ({cols}) SELECT {cols} FROM {q};"))
+    con.execute(text(f"DROP TABLE {q};"))
+    con.execute(text(f"ALTER TABLE {qi(schema)}.{qi(tmp)} RENAME TO {qi(table)};"))
+
+    # mesmos nomes/definições: o índice antigo sumiu com o DROP e a tabela já tem o nome original
+    recreated = 0
+    for ddl in index_defs:
+        if ddl.startswith("CREATE UNIQUE"):
+            print(f"⚠️ {schema}.{table}: índice UNIQUE não recriado na particionada: {ddl}")
+            continue
+        con.execute(text(ddl))
+        recreated += 1
+    if owner:
+        con.execute(text(f"ALTER TABLE {q} OWNER TO {qi(owner)};"))
+    for priv, grantee in grants:
+        con.execute(text(f"GRANT {priv} ON {q} TO {grantee};"))
+    if verbose:
+        print(f"🧩 {schema}.{table} particionada por ano ({len(years)} partições + default, "
+              f"{recreated} índices recriados).")
+
+def ensure_staging_year_index(con, schema: str, table: str, year_col: str, verbose: bool = False) -> None:
+    """Índice de expressão em NULLIF(ano,'')::int — a mesma expressão do filtro de anos dos builders."""
+    idx = f"idx_{table}_ano_int"
+    con.execute(text(f"CREATE INDEX IF NOT EXISTS {qi(idx)} ON {qi(schema)}.{qi(table)} ({year_key_sql(year_col)});"))
+    if verbose:
+        print(f"🗂️  Índice de ano garantido em {schema}.{table}.")
+
 # ========================= Backfill SQL builders =========================
 
+def despesa_value_exprs(schema_s: str, vcols: Dict[str, Optional[str]]) -> Dict[str, str]:
+    """Expressões de valor por linha de cada staging de despesa (emp/liq/pag)."""
+    def num(c: Optional[str]) -> str:
+        return numeric_fn_sql(schema_s, c) if c else "0::numeric"
+
+    return {
+        "emp": num(vcols["emp"] or vcols["emp_fallback"]),
+        "liq": f'{num(vcols["liq_orc"])} + {num(vcols["liq_rap"])}',
+        "pag": f'{num(vcols["pag_orc"])} + {num(vcols["pag_rap"])}',
+    }
+
 def sql_build_backfill_despesa(schema_f: str, schema_s: str,
                                y_emp: str, y_liq: str, y_pag: str,
                                entidade_emp: str, entidade_liq: str, entidade_pag: str,
                                vcols: Dict[str, Optional[str]],
                                years: List[int]) -> str:
-    emp_expr = to_numeric_sql(f'"{vcols["emp"]}"') if vcols["emp"] else (
-               to_numeric_sql(f'"{vcols["emp_fallback"]}"') if vcols["emp_fallback"] else "0::numeric")
-    liq_orc_expr = to_numeric_sql(f'"{vcols["liq_orc"]}"') if vcols["liq_orc"] else "0::numeric"
-    liq_rap_expr = to_numeric_sql(f'"{vcols["liq_rap"]}"') if vcols["liq_rap"] else "0::numeric"
-    pag_orc_expr = to_numeric_sql(f'"{vcols["pag_orc"]}"') if vcols["pag_orc"] else "0::numeric"
-    pag_rap_expr = to_numeric_sql(f'"{vcols["pag_rap"]}"') if vcols["pag_rap"] else "0::numeric"
-
-    years_sql = "(" + ",".join(str(y) for y in years) + ")"
+    vx = despesa_value_exprs(schema_s, vcols)
+    years_sql = years_filter_sql(years)
 
     return f"""
     -- Apaga anos-alvo em fato_despesa
-    DELETE FROM "{schema_f}"."fato_despesa" WHERE exercicio IN {years_sql};
-
-    WITH emp AS (
-      SELECT NULLIF(e."{y_emp}", '')::int AS exercicio,
-             e."{entidade_emp}"::text      AS entidade,
-             SUM(COALESCE({emp_expr},0))   AS v_emp
-      FROM "{schema_s}"."stg_despesas_empenhadas" e
-      WHERE NULLIF(e."{y_emp}", '')::int IN {years_sql}
-      GROUP BY 1,2
-    ),
-    liq AS (
-      SELECT NULLIF(l."{y_liq}", '')::int AS exercicio,
-             l."{entidade_liq}"::text      AS entidade,
-             SUM(COALESCE({liq_orc_expr},0) + COALESCE({liq_rap_expr},0)) AS v_liq
-      FROM "{schema_s}"."stg_despesas_liquidadas" l
-      WHERE NULLIF(l."{y_liq}", '')::int IN {years_sql}
-      GROUP BY 1,2
-    ),
-    pag AS (
-      SELECT NULLIF(p."{y_pag}", '')::int AS exercicio,
-             p."{entidade_pag}"::text      AS entidade,
-             SUM(COALESCE({pag_orc_expr},0) + COALESCE({pag_rap_expr},0)) AS v_pag
-      FROM "{schema_s}"."stg_despesas_pagas" p
-      WHERE NULLIF(p."{y_pag}", '')::int IN {years_sql}
-      GROUP BY 1,2
-    ),
-    j AS (
-      SELECT COALESCE(emp.exercicio, liq.exercicio, pag.exercicio) AS exercicio,
-             COALESCE(emp.entidade,  liq.entidade,  pag.entidade ) AS entidade,
-             emp.v_emp, liq.v_liq, pag.v_pag
-      FROM emp
-      FULL JOIN liq ON liq.exercicio = emp.exercicio AND liq.entidade = emp.entidade
-      FULL JOIN pag ON pag.exercicio = COALESCE(emp.exercicio, liq.exercicio)
-                   AND pag.entidade  = COALESCE(emp.entidade,  liq.entidade)
-    )
-    INSERT INTO "{schema_f}"."fato_despesa"(exercicio, entidade, valor_empenhado, valor_liquidado, valor_pago)
-    SELECT j.exercicio, j.entidade,
-           COALESCE(j.v_emp,0), COALESCE(j.v_liq,0), COALESCE(j.v_pag,0)
-    FROM j;
+    DELETE FROM {qi(schema_f)}."fato_despesa" WHERE exercicio {years_sql};
+
+    -- Uma passada por staging (UNION ALL) e um único HashAgg: anos filtrados e valores
+    -- convertidos uma única vez por linha, sem FULL JOIN entre agregados
+    INSERT INTO {qi(schema_f)}."fato_despesa"(exercicio, entidade, valor_empenhado, valor_liquidado, valor_pago)
+    SELECT exercicio, entidade, SUM(v_emp), SUM(v_liq), SUM(v_pag)
+    FROM (
+      SELECT NULLIF(e.{qi(y_emp)}, '')::int AS exercicio,
+             e.{qi(entidade_emp)}::text      AS entidade,
+             {vx["emp"]}                   AS v_emp,
+             0::numeric AS v_liq, 0::numeric AS v_pag
+      FROM {qi(schema_s)}."stg_despesas_empenhadas" e
+      UNION ALL
+      SELECT NULLIF(l.{qi(y_liq)}, '')::int AS exercicio,
+             l.{qi(entidade_liq)}::text      AS entidade,
+             0::numeric,
+             {vx["liq"]},
+             0::numeric
+      FROM {qi(schema_s)}."stg_despesas_liquidadas" l
+      UNION ALL
+      SELECT NULLIF(p.{qi(y_pag)}, '')::int AS exercicio,
+             p.{qi(entidade_pag)}::text      AS entidade,
+             0::numeric, 0::numeric,
+             {vx["pag"]}
+      FROM {qi(schema_s)}."stg_despesas_pagas" p
+    ) a
+    WHERE a.exercicio {years_sql}
+    GROUP BY 1,2
+    ON CONFLICT (exercicio, entidade) DO UPDATE
+      SET valor_empenhado = EXCLUDED.valor_empenhado,
+          valor_liquidado = EXCLUDED.valor_liquidado,
+          valor_pago      = EXCLUDED.valor_pago;
     """
 
 def sql_build_backfill_receita(schema_f: str, schema_s: str,
                                y_rec: str, espec: str, prev: str, arr: str,
                                years: List[int]) -> str:
-    years_sql = "(" + ",".join(str(y) for y in years) + ")"
-    prev_expr = to_numeric_sql(f'"{prev}"')
-    arr_expr  = to_numeric_sql(f'"{arr}"')
+    years_sql = years_filter_sql(years)
+    prev_expr = numeric_fn_sql(schema_s, prev)
+    arr_expr  = numeric_fn_sql(schema_s, arr)
 
     return f"""
     -- Apaga anos-alvo em fato_receita
-    DELETE FROM "{schema_f}"."fato_receita" WHERE exercicio IN {years_sql};
-
-    INSERT INTO "{schema_f}"."fato_receita"(exercicio, especificacao, previsao, arrecadacao)
-    SELECT NULLIF(r."{y_rec}", '')::int AS exercicio,
-           r."{espec}"::text            AS especificacao,
-           SUM(COALESCE({prev_expr},0)) AS previsao,
-           SUM(COALESCE({arr_expr},0))  AS arrecadacao
-    FROM "{schema_s}"."stg_receitas" r
-    WHERE NULLIF(r."{y_rec}", '')::int IN {years_sql}
-    GROUP BY 1,2;
+    DELETE FROM {qi(schema_f)}."fato_receita" WHERE exercicio {years_sql};
+
+    INSERT INTO {qi(schema_f)}."fato_receita"(exercicio, especificacao, previsao, arrecadacao)
+    SELECT exercicio, especificacao, SUM(previsao), SUM(arrecadacao)
+    FROM (
+      SELECT NULLIF(r.{qi(y_rec)}, '')::int AS exercicio,
+             r.{qi(espec)}::text            AS especificacao,
+             {prev_expr}                  AS previsao,
+             {arr_expr}                   AS arrecadacao
+      FROM {qi(schema_s)}."stg_receitas" r
+    ) r
+    WHERE exercicio {years_sql}
+    GROUP BY 1,2
+    ON CONFLICT (exercicio, especificacao) DO UPDATE
+      SET previsao    = EXCLUDED.previsao,
+          arrecadacao = EXCLUDED.arrecadacao;
+    """
+
+def sql_audit_staging(schema_s: str, y_emp: str, y_liq: str, y_pag: str,
+                      vcols: Dict[str, Optional[str]], rec_cols: Dict[str, str],
+                      years: List[int]) -> str:
+    """
+    Totais por ano das 4 stagings numa única consulta (tag 'emp'|'liq'|'pag'|'rec').
+    v2 só é preenchido para receita (arrecadação; v1 = previsão).
+    """
+    vx = despesa_value_exprs(schema_s, vcols)
+    prev_expr = numeric_fn_sql(schema_s, rec_cols["prev"])
+    arr_expr = numeric_fn_sql(schema_s, rec_cols["arr"])
+    return f"""
+    WITH t AS (
+      SELECT 'emp' AS tag, NULLIF({qi(y_emp)}, '')::int AS ano, {vx["emp"]} AS v1, NULL::numeric AS v2
+      FROM {qi(schema_s)}."stg_despesas_empenhadas"
+      UNION ALL
+      SELECT 'liq', NULLIF({qi(y_liq)}, '')::int, {vx["liq"]}, NULL
+      FROM {qi(schema_s)}."stg_despesas_liquidadas"
+      UNION ALL
+      SELECT 'pag', NULLIF({qi(y_pag)}, '')::int, {vx["pag"]}, NULL
+      FROM {qi(schema_s)}."stg_despesas_pagas"
+      UNION ALL
+      SELECT 'rec', NULLIF({qi(rec_cols['year'])}, '')::int, {prev_expr}, {arr_expr}
+      FROM {qi(schema_s)}."stg_receitas"
+    )
+    SELECT tag, ano, SUM(v1) AS v1, SUM(v2) AS v2
+    FROM t
+    WHERE ano {years_filter_sql(years)}
+    GROUP BY 1,2
+    ORDER BY 1,2;
     """
 
+def print_audit(rows) -> None:
+    labels = {"emp": "Empenhado", "liq": "Liquidado", "pag": "Pago", "rec": "Receita (prev/arr)"}
+    by_tag: Dict[str, list] = {}
+    for tag, ano, v1, v2 in rows:
+        by_tag.setdefault(tag, []).append((ano, v1, v2))
+    print("🔎 Auditoria da staging (totais por ano):")
+    for tag in ("emp", "liq", "pag", "rec"):
+        for ano, v1, v2 in by_tag.get(tag, []):
+            extra = f" / {v2:,.2f}" if v2 is not None else ""
+            print(f"   • {labels[tag]} {ano}: {v1:,.2f}{extra}")
+
+# Grão de cada fato: índice UNIQUE composto (um por fato) usado também pelo ON CONFLICT
+FACT_GRAIN = {
+    "fato_despesa": ["exercicio", "entidade"],
+    "fato_receita": ["exercicio", "especificacao"],
+}
+
+def ensure_fact_index(con, schema: str, table: str, years: List[int], verbose: bool = False):
+    """
+    Cria (se faltar) o índice UNIQUE do grão do fato — precisa existir antes do INSERT ... ON CONFLICT.
+    Na primeira criação, fatos antigos podem ter o grão repetido (appends repetidos, carga por outra
+    ferramenta). Nos anos de --years as linhas repetidas são apagadas (o build apaga e regrava esses
+    anos de qualquer forma); repetição fora deles aborta com a lista dos grãos, sem escolher linha.
+    """
+    cols = FACT_GRAIN[table]
+    idx = f"uq_{table}_{'_'.join(cols)}"
+    q = f"{qi(schema)}.{qi(table)}"
+    if con.execute(text("SELECT to_regclass(:i) IS NOT NULL"), {"i": f"{qi(schema)}.{qi(idx)}"}).scalar():
+        return
+    cols_sql = ", ".join(qi(c) for c in cols)
+    not_null = " AND ".join(f"{qi(c)} IS NOT NULL" for c in cols)
+    dups = f"SELECT {cols_sql} FROM {q} WHERE {not_null} GROUP BY {cols_sql} HAVING count(*) > 1"
+    removed = con.execute(text(f"""
+      DELETE FROM {q}
+      WHERE exercicio {years_filter_sql(years)} AND ({cols_sql}) IN ({dups});
+    """)).rowcount
+    if removed:
+        print(f"⚠️ {schema}.{table}: {removed} linha(s) com grão ({', '.join(cols)}) repetido apagadas "
+              f"nos anos de --years (serão regravadas pelo backfill).")
+    left = con.execute(text(f"{dups} ORDER BY {cols_sql} LIMIT 20")).fetchall()
+    if left:
+        lista = "; ".join(", ".join(str(v) for v in r) for r in left)
+        raise RuntimeError(f"{schema}.{table} tem grão ({', '.join(cols)}) repetido fora de --years; "
+                           f"corrija antes do índice único (até 20): {lista}")
+    con.execute(text("SET LOCAL maintenance_work_mem = '512MB'"))
+    con.execute(text(f'CREATE UNIQUE INDEX IF NOT EXISTS {qi(idx)} ON {q} ({cols_sql}) WITH (fillfactor = 100);'))
+    if verbose:
+        print(f"🗂️  Índice de {table} garantido.")
+
 # ========================= Maintenance (VACUUM/ANALYZE) =========================
 
-def run_maintenance(engine, schema: str, do_vacuum: bool, do_analyze: bool, verbose: bool = False):
+def run_maintenance(engine, schema: str, do_vacuum: bool, do_analyze: bool, verbose: bool = False,
+                    parallel: int = 0):
     """
     Executa VACUUM/ANALYZE corretamente:
       - VACUUM: precisa de AUTOCOMMIT (fora de transação)
-      - ANALYZE: pode rodar em transação, mas usamos o mesmo canal autocommit
+      - VACUUM + ANALYZE: um único VACUUM (ANALYZE) por tabela (uma varredura, não duas)
+      - SKIP_LOCKED: pula a tabela se estiver bloqueada em vez de esperar
     """
     if not (do_vacuum or do_analyze):
         return
 
+    tables = (f'{qi(schema)}."fato_despesa"', f'{qi(schema)}."fato_receita"')
     with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as con:
         if do_vacuum:
-            con.execute(text(f'VACUUM (VERBOSE) "{schema}"."fato_despesa";'))
-            con.execute(text(f'VACUUM (VERBOSE) "{schema}"."fato_receita";'))
+            opts = ["VERBOSE", "SKIP_LOCKED", f"PARALLEL {max(int(parallel), 0)}"]
+            if do_analyze:
+                opts.insert(0, "ANALYZE")
+            for t in tables:
+                con.execute(text(f'VACUUM ({", ".join(opts)}) {t};'))
             if verbose:
-                print("🧹 VACUUM executado (autocommit).")
-        if do_analyze:
-            con.execute(text(f'ANALYZE "{schema}"."fato_despesa";'))
-            con.execute(text(f'ANALYZE "{schema}"."fato_receita";'))
+                print(f"🧹 VACUUM{' + ANALYZE' if do_analyze else ''} executado (autocommit).")
+        else:
+            for t in tables:
+                con.execute(text(f'ANALYZE (SKIP_LOCKED) {t};'))
             if verbose:
                 print("📊 ANALYZE executado.")
 
+# ========================= Export (COPY BINARY) =========================
+
+def export_facts_binary(engine, schema: str, out_dir: str, verbose: bool = False):
+    """
+    Exporta os fatos com COPY ... TO STDOUT (FORMAT BINARY): numeric vai em
+    largura fixa, sem numeric_out/texto. Gera <out_dir>/<tabela>.bin.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cur:
+            for table in ("fato_despesa", "fato_receita"):
+                path = os.path.join(out_dir, f"{table}.bin")
+                with open(path, "wb") as fh:
+                    cur.copy_expert(f'COPY {qi(schema)}.{qi(table)} TO STDOUT WITH (FORMAT BINARY)', fh)
+                if verbose:
+                    print(f"📦 Exportado {schema}.{table} → {path}")
+        raw.commit()
+    finally:
+        raw.close()
+
 # ========================= Main =========================
 
+def set_tx_options(con, args) -> None:
+    """Parâmetros SET LOCAL aplicados no início de cada transação do backfill."""
+    # não fica esperando lock da staging/fatos nem segura transação ociosa
+    con.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+    con.execute(text(f"SET LOCAL idle_in_transaction_session_timeout = '{IDLE_TX_TIMEOUT}'"))
+    # Fatos são recalculáveis a partir da staging: não espera flush do WAL no COMMIT
+    # e dá memória ao HashAgg para não derramar em disco
+    con.execute(text("SET LOCAL synchronous_commit = off"))
+    con.execute(text("SELECT set_config('work_mem', :v, true)"), {"v": args.work_mem})
+    # Agregação paralela sobre a staging (stg_to_numeric é PARALLEL SAFE)
+    con.execute(text("SELECT set_config('max_parallel_workers_per_gather', :v, true)"), {"v": str(args.parallel_workers)})
+    con.execute(text("SET LOCAL parallel_setup_cost = 10"))
+    con.execute(text("SET LOCAL parallel_tuple_cost = 0.01"))
+    con.execute(text("SET LOCAL min_parallel_table_scan_size = '8kB'"))
+    con.execute(text("SET LOCAL enable_partitionwise_aggregate = on"))
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--schema", default="public", help="Esquema dos Fatos (destino)")
@@ -313,6 +616,13 @@ def main():
     ap.add_argument("--years", required=True, help="Faixa/lista: 2018-2025 ou 2018,2019")
     ap.add_argument("--vacuum", action="store_true", help="Executa VACUUM nas tabelas de fatos ao final")
     ap.add_argument("--analyze", action="store_true", help="Executa ANALYZE nas tabelas de fatos ao final")
+    ap.add_argument("--audit", action="store_true", help="Imprime totais por ano da staging (uma consulta) antes do backfill")
+    ap.add_argument("--export-copy", metavar="DIR", help="Exporta os fatos em COPY BINARY para DIR/<tabela>.bin ao final")
+    ap.add_argument("--partition-staging", action="store_true", help="(admin) Particiona a staging por ano antes do backfill (preserva índices/dono/GRANTs); "
+                         "se já particionada, cria as partições dos anos novos que caíram na default")
+    ap.add_argument("--index-staging", action="store_true", help="Garante índice de expressão NULLIF(ano,'')::int nas stagings")
+    ap.add_argument("--parallel-workers", type=int, default=4, help="max_parallel_workers_per_gather da transação (default: 4; 0 desliga)")
+    ap.add_argument("--work-mem", default="256MB", help="work_mem da transação de backfill (default: 256MB)")
     ap.add_argument("--verbose", action="store_true")
     args = ap.parse_args()
 
@@ -323,6 +633,8 @@ def main():
         if args.verbose:
             print(f"➡️  Backfill anos {years} (fatos em {args.schema}, staging em {args.staging})")
 
+        set_tx_options(con, args)
+
         # Validação básica de staging
         required = [
             "stg_despesas_empenhadas",
@@ -330,20 +642,18 @@ def main():
             "stg_despesas_pagas",
             "stg_receitas",
         ]
-        for t in required:
-            con.execute(text(f"""
-              DO $$
-              BEGIN
-                IF NOT EXISTS (
-                  SELECT 1 FROM information_schema.tables
-                  WHERE table_schema = :s AND table_name = :t
-                ) THEN
-                  RAISE EXCEPTION 'Tabela % não encontrada em %.%', :t, :s, :t;
-                END IF;
-              END $$;
-            """), {"s": args.staging, "t": t})
-
-        # Resolver colunas
+        # uma única consulta para as 4 tabelas (antes: um DO $$ por tabela)
+        missing = [r[0] for r in con.execute(text("""
+          SELECT t FROM unnest(CAST(:ts AS text[])) AS t
+          WHERE to_regclass(quote_ident(:s) || '.' || quote_ident(t)) IS NULL
+        """), {"s": args.staging, "ts": required}).fetchall()]
+        if missing:
+            raise RuntimeError(f"Tabelas não encontradas em {args.staging}: {', '.join(missing)}")
+
+        ensure_numeric_fn(con, args.staging)
+
+        # Resolver colunas (catálogo lido uma vez para as 4 tabelas)
+        prefetch_columns(con, args.staging, required)
         y_emp = resolve_year_col(con, args.staging, "stg_despesas_empenhadas")
         y_liq = resolve_year_col(con, args.staging, "stg_despesas_liquidadas")
         y_pag = resolve_year_col(con, args.staging, "stg_despesas_pagas")
@@ -362,7 +672,26 @@ def main():
         if args.verbose:
             print(f"   • Receita: ano={y_rec_cols['year']} | espec={y_rec_cols['espec']} | prev={y_rec_cols['prev']} | arr={y_rec_cols['arr']}")
 
-        # Executa backfill de DESPESA
+        if args.partition_staging:
+            for t, ycol in (("stg_despesas_empenhadas", y_emp), ("stg_despesas_liquidadas", y_liq),
+                            ("stg_despesas_pagas", y_pag), ("stg_receitas", y_rec_cols["year"])):
+                ensure_staging_partitioned(con, args.staging, t, ycol, args.verbose)
+
+        if args.index_staging:
+            for t, ycol in (("stg_despesas_empenhadas", y_emp), ("stg_despesas_liquidadas", y_liq),
+                            ("stg_despesas_pagas", y_pag), ("stg_receitas", y_rec_cols["year"])):
+                ensure_staging_year_index(con, args.staging, t, ycol, args.verbose)
+
+        if args.audit:
+            rows = con.execute(text(sql_audit_staging(
+                args.staging, y_emp, y_liq, y_pag, vcols, y_rec_cols, years
+            ))).fetchall()
+            print_audit(rows)
+
+    # Um fato por transação: locks na staging/fatos ficam presos só durante cada build
+    with engine.begin() as con:
+        set_tx_options(con, args)
+        ensure_fact_index(con, args.schema, "fato_despesa", years, args.verbose)
         sql_desp = sql_build_backfill_despesa(
             schema_f=args.schema,
             schema_s=args.staging,
@@ -372,10 +701,12 @@ def main():
             years=years
         )
         con.execute(text(sql_desp))
-        if args.verbose:
-            print("✅ Fato Despesa backfilled.")
+    if args.verbose:
+        print("✅ Fato Despesa backfilled.")
 
-        # Executa backfill de RECEITA
+    with engine.begin() as con:
+        set_tx_options(con, args)
+        ensure_fact_index(con, args.schema, "fato_receita", years, args.verbose)
         sql_rec = sql_build_backfill_receita(
             schema_f=args.schema,
             schema_s=args.staging,
@@ -384,11 +715,14 @@ def main():
             years=years
         )
         con.execute(text(sql_rec))
-        if args.verbose:
-            print("✅ Fato Receita backfilled.")
+    if args.verbose:
+        print("✅ Fato Receita backfilled.")
 
     # Manutenção (fora da transação)
-    run_maintenance(engine, args.schema, args.vacuum, args.analyze, args.verbose)
+    run_maintenance(engine, args.schema, args.vacuum, args.analyze, args.verbose, args.parallel_workers)
+
+    if args.export_copy:
+        export_facts_binary(engine, args.schema, args.export_copy, args.verbose)
 
     if args.verbose:
         print("🏁 Backfill concluído com sucesso.")
@@ -30,22 +30,29 @@ Uso típico:
     --stages empenhadas,liquidadas,pagas \
     --include-receita \
     --timeout 90 --retries 3 --backoff 1.5 \
+    --workers 4 \
     --verbose
 """
 
 import argparse
 import glob
+import itertools
 import os
 import re
 import sys
+import threading
 import time
 import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from urllib.parse import urljoin
 
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # ===================== CONFIG base (igual ao 01) =====================
 
@@ -92,18 +99,43 @@ def http_post(session: requests.Session, url: str, data=None, timeout=90, header
     r.raise_for_status()
     return r
 
-def retry(fn, retries=3, backoff=1.5, verbose=False):
-    last = None
-    for i in range(1, retries + 1):
-        try:
-            return fn()
-        except Exception as e:
-            last = e
-            if verbose:
-                print(f"⚠️ tentativa {i}/{retries} falhou: {e}")
-            if i < retries:
-                time.sleep(backoff * i)
-    raise last
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+def make_session(retries: int = 3, backoff: float = 1.5, pool_maxsize: int = 16) -> requests.Session:
+    """
+    Session com keep-alive e pool de conexões; falhas de rede e 429/5xx são repetidas pelo urllib3
+    (backoff exponencial, respeita Retry-After). retries = nº total de tentativas, como antes.
+    """
+    sess = requests.Session()
+    policy = Retry(
+        total=max(int(retries) - 1, 0),
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUS,
+        allowed_methods=frozenset(["GET", "POST"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,  # devolve a última resposta; http_get/http_post fazem raise_for_status
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=policy)
+    sess.mount("http://", adapter)
+    sess.mount("https://", adapter)
+    return sess
+
+_TLS = threading.local()
+
+def thread_session(retries: int = 3, backoff: float = 1.5) -> requests.Session:
+    """Uma Session (make_session) por thread — Session não é thread-safe; reaproveita conexões/cookies."""
+    sess = getattr(_TLS, "session", None)
+    if sess is None:
+        sess = _TLS.session = make_session(retries, backoff)
+    return sess
+
+def run_tasks(fn: Callable[..., Any], tasks: List[tuple], workers: int) -> List[Any]:
+    """Executa fn(*t) para cada tarefa; com workers > 1 usa threads (trabalho dominado por I/O de rede).
+    Resultados na ordem das tarefas; a primeira exceção é propagada."""
+    if workers <= 1 or len(tasks) <= 1:
+        return [fn(*t) for t in tasks]
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(lambda t: fn(*t), tasks))
 
 DISPLAYTAG_ID_RE = re.compile(r"\bd-(\d+)(?:-\w+)?")
 CSV_ANCHOR_RE = re.compile(r'href="([^"]*?csv[^"]*)"', re.IGNORECASE)
@@ -162,7 +194,7 @@ def build_params(stage_cfg: Dict, ano: int) -> Dict:
     return {pm["exercicio"]: str(ano), pm["entidade"]: stage_cfg.get("entidade_all", "")}
 
 def try_export_get(session: requests.Session, list_url: str, base_params: Dict, d_id: str,
-                   timeout: int, retries: int, backoff: float, verbose: bool) -> Optional[bytes]:
+                   timeout: int, verbose: bool) -> Optional[bytes]:
     variants = []
     def add(extra):
         p = dict(base_params); p.update(extra); variants.append(p)
@@ -175,14 +207,14 @@ def try_export_get(session: requests.Session, list_url: str, base_params: Dict,
         if verbose:
             extra = {k:v for k,v in params.items() if k not in base_params}
             print(f"🔁 GET export {i}/{len(variants)} extras={extra}")
-        resp = retry(lambda: http_get(session, list_url, params=params, timeout=timeout,
-                                      headers={"Referer": list_url}), retries, backoff, verbose)
+        resp = http_get(session, list_url, params=params, timeout=timeout,
+                        headers={"Referer": list_url})
         if content_is_csv(resp, resp.content):
             return resp.content
     return None
 
 def try_export_post(session: requests.Session, list_url: str, base_params: Dict, d_id: Optional[str], html: str,
-                    timeout: int, retries: int, backoff: float, verbose: bool) -> Optional[bytes]:
+                    timeout: int, verbose: bool) -> Optional[bytes]:
     try:
         from bs4 import BeautifulSoup
     except Exception:
@@ -208,22 +240,22 @@ def try_export_post(session: requests.Session, list_url: str, base_params: Dict,
         payload[f"d-{d_id}-e"] = "1"
     if verbose:
         print(f"📝 POST export form → {action}")
-    resp = retry(lambda: http_post(session, action, data=payload, timeout=timeout,
-                                   headers={"Referer": list_url, "Content-Type": "application/x-www-form-urlencoded"}),
-                 retries, backoff, verbose)
+    resp = http_post(session, action, data=payload, timeout=timeout,
+                     headers={"Referer": list_url, "Content-Type": "application/x-www-form-urlencoded"})
     if content_is_csv(resp, resp.content):
         return resp.content
     return None
 
 def fetch_portal_csv(session: requests.Session, base_url: str, stage: str, ano: int, out_dir: Path,
-                     timeout=90, retries=3, backoff=1.5, verbose=False) -> Path:
+                     timeout=90, verbose=False) -> Path:
+    # retentativas de rede/5xx ficam na Session (make_session)
     cfg = CONFIG["stages"][stage]
     list_url = urljoin(base_url, cfg["list_path"])
     params = build_params(cfg, ano)
     if verbose:
         print(f"📄 GET lista: {list_url} params={params}")
-    resp = retry(lambda: http_get(session, list_url, params=params, timeout=timeout,
-                                  headers={"Referer": list_url}), retries, backoff, verbose)
+    resp = http_get(session, list_url, params=params, timeout=timeout,
+                    headers={"Referer": list_url})
     html = resp.text
 
     # link csv direto?
@@ -235,8 +267,8 @@ def fetch_portal_csv(session: requests.Session, base_url: str, stage: str, ano:
     if csv_link:
         if verbose:
             print(f"⬇️ link CSV encontrado: {csv_link}")
-        csv_resp = retry(lambda: http_get(session, csv_link, timeout=timeout,
-                                          headers={"Referer": list_url}), retries, backoff, verbose)
+        csv_resp = http_get(session, csv_link, timeout=timeout,
+                            headers={"Referer": list_url})
         if content_is_csv(csv_resp, csv_resp.content):
             write_csv_text(dest, csv_resp.content, resp=csv_resp)
             return dest
@@ -244,7 +276,7 @@ def fetch_portal_csv(session: requests.Session, base_url: str, stage: str, ano:
     # export GET com d-id
     d_id = extract_displaytag_id(html)
     if d_id:
-        content = try_export_get(session, list_url, params, d_id, timeout, retries, backoff, verbose)
+        content = try_export_get(session, list_url, params, d_id, timeout, verbose)
         if content:
             write_csv_text(dest, content, resp=None)
             return dest
@@ -253,14 +285,14 @@ def fetch_portal_csv(session: requests.Session, base_url: str, stage: str, ano:
     if not d_id:
         for extras in ({"6578706f7274": "1"}, {"exportType": "csv"}, {"displaytag_export": "true"}, {"export": "csv"}):
             test = dict(params); test.update(extras)
-            resp_try = retry(lambda: http_get(session, list_url, params=test, timeout=timeout,
-                                              headers={"Referer": list_url}), retries, backoff, verbose)
+            resp_try = http_get(session, list_url, params=test, timeout=timeout,
+                                headers={"Referer": list_url})
             if content_is_csv(resp_try, resp_try.content):
                 write_csv_text(dest, resp_try.content, resp=resp_try)
                 return dest
 
     # POST fallback
-    content = try_export_post(session, list_url, params, d_id, html, timeout, retries, backoff, verbose)
+    content = try_export_post(session, list_url, params, d_id, html, timeout, verbose)
     if content:
         write_csv_text(dest, content, resp=None)
         return dest
@@ -273,14 +305,16 @@ def fetch_portal_csv(session: requests.Session, base_url: str, stage: str, ano:
 
 # ===================== Normalização / soma de DESPESAS =====================
 
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+@lru_cache(maxsize=4096)
 def norm_key(s: str) -> str:
     if s is None:
         return ""
-    s = "".join(ch for ch in unicodedata.normalize("NFD", s) if unicodedata.category(ch) != "Mn")
-    s = s.lower()
-    s = re.sub(r"[^a-z0-9]+", "_", s)
-    s = re.sub(r"_+", "_", s).strip("_")
-    return s
+    if not s.isascii():
+        s = "".join(ch for ch in unicodedata.normalize("NFD", s) if unicodedata.category(ch) != "Mn")
+    # [^a-z0-9]+ já colapsa sequências, então não sobram "__"
+    return _NON_ALNUM_RE.sub("_", s.lower()).strip("_")
 
 def to_numeric_br(x: str) -> float:
     if x is None:
@@ -300,7 +334,51 @@ def to_numeric_br(x: str) -> float:
             v = 0.0
     return -v if neg else v
 
+_NUM_VALID_RE = r"-?(?:\d+\.?\d*|\.\d+)"
+
+def to_numeric_br_series(s: pd.Series) -> pd.Series:
+    """Versão vetorizada de to_numeric_br (mesmas regras, coluna inteira nos kernels .str do pandas)."""
+    t = s.astype("str").fillna("").str.strip().str.replace("\xa0", " ", regex=False)
+    neg = t.str.startswith("(") & t.str.endswith(")")
+    t = t.str.replace(r"[()]", "", regex=True)
+    br = t.str.count(",") == 1
+    t = t.where(~br, t.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    t = t.str.replace(r"[^0-9.\-]", "", regex=True)
+    # só converte o que float() aceitaria; o resto (vazio, "-", "1.2.3"...) vale 0, como no escalar
+    ok = t.str.fullmatch(_NUM_VALID_RE)
+    v = pd.Series(0.0, index=s.index)
+    v[ok] = t[ok].astype("float64")
+    return v.where(~neg, -v)
+
+# valores lidos como nulo pelo pandas.read_csv (na_values padrão)
+PANDAS_NA_VALUES = ["", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+                    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"]
+
+def read_csv_arrow(path: Path, sep: str) -> Optional[pd.DataFrame]:
+    """
+    Lê CSV via pyarrow.csv (C++, multi-thread), todas as colunas como texto — mesmo resultado de
+    pd.read_csv(dtype=str). None se pyarrow indisponível ou o arquivo não parsear (linhas irregulares etc.).
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+        # nomes do cabeçalho pelo próprio pandas (só a 1ª linha): mesma deduplicação "x", "x.1"…
+        names = [str(c) for c in pd.read_csv(path, sep=sep, nrows=0, encoding="utf-8-sig").columns]
+        table = pacsv.read_csv(
+            str(path),
+            read_options=pacsv.ReadOptions(column_names=names, skip_rows=1),
+            parse_options=pacsv.ParseOptions(delimiter=sep, newlines_in_values=True),
+            convert_options=pacsv.ConvertOptions(column_types={n: pa.string() for n in names},
+                                                 strings_can_be_null=True, null_values=PANDAS_NA_VALUES),
+        )
+    except (ImportError, ValueError, TypeError):
+        return None
+    return table.to_pandas()
+
 def read_csv_any(path: Path) -> pd.DataFrame:
+    df = read_csv_arrow(path, ";")
+    if df is not None:
+        return df
     try:
         return pd.read_csv(path, sep=";", dtype=str, encoding="utf-8-sig")
     except Exception:
@@ -311,7 +389,7 @@ def drop_total_rows(df: pd.DataFrame) -> pd.DataFrame:
         return df.copy()
     mask = pd.Series(False, index=df.index)
     # considere apenas colunas textuais
-    text_cols = [c for c in df.columns if df[c].dtype == object]
+    text_cols = [c for c in df.columns if pd.api.types.is_string_dtype(df[c].dtype)]
     if not text_cols:
         return df.copy()
     # remove somente linhas onde ALGUMA coluna textual seja exatamente "TOTAL"
@@ -320,8 +398,11 @@ def drop_total_rows(df: pd.DataFrame) -> pd.DataFrame:
         mask = mask | df[c].astype(str).str.match(rx, na=False)
     return df.loc[~mask].copy()
 
-def find_cols(df: pd.DataFrame, must: List[str], any_of: Optional[List[str]] = None) -> List[str]:
-    nk = {col: norm_key(col) for col in df.columns}
+def find_cols(df: pd.DataFrame, must: List[str], any_of: Optional[List[str]] = None,
+              nk: Optional[Dict[str, str]] = None) -> List[str]:
+    """nk: mapa coluna -> norm_key já montado (evita recalcular a cada chamada)."""
+    if nk is None:
+        nk = {col: norm_key(col) for col in df.columns}
     # ampliar sinônimos leves
     syn = {
         "empenhad": ["empenhad", "empenho"],
@@ -354,27 +435,28 @@ def autodetect_sum_despesa(df: pd.DataFrame, stage: str) -> Tuple[float, List[st
     used: List[str] = []
     total = 0.0
 
+    nk = {col: norm_key(col) for col in df2.columns}  # uma vez por DataFrame
     if stage == "empenhadas":
-        used = find_cols(df2, must=["empenhad"])
+        used = find_cols(df2, must=["empenhad"], nk=nk)
     elif stage == "liquidadas":
-        cols_orc = find_cols(df2, must=["liquid"], any_of=["orc", "orcamento"])
-        cols_rap = find_cols(df2, must=["liquid"], any_of=["restos"])
+        cols_orc = find_cols(df2, must=["liquid"], any_of=["orc", "orcamento"], nk=nk)
+        cols_rap = find_cols(df2, must=["liquid"], any_of=["restos"], nk=nk)
         used = cols_orc + [c for c in cols_rap if c not in cols_orc]
         if not used:
-            used = find_cols(df2, must=["liquid"])
+            used = find_cols(df2, must=["liquid"], nk=nk)
     elif stage == "pagas":
-        cols_orc = find_cols(df2, must=["pago"], any_of=["orc", "orcamento"])
-        cols_rap = find_cols(df2, must=["pago"], any_of=["restos"])
+        cols_orc = find_cols(df2, must=["pago"], any_of=["orc", "orcamento"], nk=nk)
+        cols_rap = find_cols(df2, must=["pago"], any_of=["restos"], nk=nk)
         used = cols_orc + [c for c in cols_rap if c not in cols_orc]
         if not used:
-            used = find_cols(df2, must=["pago"])
+            used = find_cols(df2, must=["pago"], nk=nk)
 
     if not used:
         # hard fail para te avisar que o layout/nomes mudaram
         raise ValueError(f"Nenhuma coluna de valor detectada para stage={stage}. Colunas: {list(df.columns)}")
 
     for c in used:
-        total += df2[c].map(to_numeric_br).sum()
+        total += to_numeric_br_series(df2[c]).sum()
 
     return float(total), used, removed
 
@@ -437,7 +519,7 @@ def download_anexo10_pdf(year: int, out_dir: Path, timeout: int, retries: int, b
     entidades = parse_entities_arg(entidades_arg)
     payload = anexo10_payload(year, entidades)
 
-    s = requests.Session()
+    s = thread_session(retries, backoff)  # keep-alive: reaproveita a conexão entre anos
     headers = {
         "Content-Type": "application/x-www-form-urlencoded",
         "Origin": BASE,
@@ -445,27 +527,43 @@ def download_anexo10_pdf(year: int, out_dir: Path, timeout: int, retries: int, b
         "User-Agent": DEFAULT_HEADERS["User-Agent"],
         "Accept": "application/pdf,application/octet-stream,*/*;q=0.8",
         "Accept-Language": DEFAULT_HEADERS["Accept-Language"],
-        "Connection": "close",
     }
 
     out_dir.mkdir(parents=True, exist_ok=True)
     out_pdf = out_dir / f"{year}-12-31_anexo10_prev_arrec.pdf"
+    tmp_pdf = out_pdf.with_suffix(".pdf.part")
     last_err: Optional[Exception] = None
+    # 429/5xx e falhas de conexão já são repetidas pela Session (até `retries` tentativas) e
+    # propagadas aqui sem nova rodada; este laço só repete 2xx que não é PDF e corpo interrompido
     for attempt in range(1, retries + 1):
         try:
             if verbose:
                 print(f"→ Anexo10 {year}: tentativa {attempt}/{retries}…")
-            r = s.post(URL_PROCESS, data=payload, headers=headers, timeout=timeout)
-            content = r.content or b""
-            if content[:4] != b"%PDF":
-                raise RuntimeError("Conteúdo não parece PDF (ou sessão/params inválidos).")
-            out_pdf.write_bytes(content)
+            # stream: checa o magic no 1º bloco e grava em blocos de 1 MiB num .part,
+            # renomeado só no fim (processo interrompido não deixa PDF truncado no snapshot)
+            size = 0
+            with s.post(URL_PROCESS, data=payload, headers=headers, timeout=timeout, stream=True) as r:
+                r.raise_for_status()  # status de erro já esgotou as retentativas da Session
+                chunks = r.iter_content(chunk_size=1 << 20)
+                first = next(chunks, b"")
+                if first[:4] != b"%PDF":
+                    raise RuntimeError("Conteúdo não parece PDF (ou sessão/params inválidos).")
+                with open(tmp_pdf, "wb") as fh:
+                    for chunk in itertools.chain((first,), chunks):
+                        fh.write(chunk)
+                        size += len(chunk)
+            os.replace(tmp_pdf, out_pdf)
             if verbose:
-                print(f"✅ PDF salvo: {out_pdf} ({len(content)} bytes)")
+                print(f"✅ PDF salvo: {out_pdf} ({size} bytes)")
             return out_pdf
-        except Exception as e:
+        except (RuntimeError, requests.exceptions.ChunkedEncodingError) as e:
+            tmp_pdf.unlink(missing_ok=True)
             last_err = e
-            time.sleep(max(1.5, backoff * attempt))
+            if attempt < retries:
+                time.sleep(max(1.5, backoff * attempt))
+        except requests.RequestException as e:
+            tmp_pdf.unlink(missing_ok=True)
+            raise RuntimeError(f"Falha ao baixar Anexo 10 {year}: {e}") from e
     raise RuntimeError(f"Falha ao baixar Anexo 10 {year}: {last_err}")
 
 # Parser do 03 (resumido para extrair totais de Previsão/Arrecadação)
@@ -581,49 +679,53 @@ def find_raw_csv_for_stage(rawdir: Path, stage: str, ano: int) -> Optional[Path]
     candidates = list((rawdir / stage).glob(f"*{ano}*.csv"))
     return sorted(candidates)[-1] if candidates else None
 
+def reconcile_despesa(ano: int, stage: str, rawdir: Path, outdir: Path,
+                      base_url: str, timeout: int, retries: int, backoff: float,
+                      verbose: bool) -> Tuple[Dict, List[Dict]]:
+    """RAW x PORTAL de um (ano, stage): linha do reconcile + log de colunas usadas."""
+    raw_csv = find_raw_csv_for_stage(rawdir, stage, ano)
+    if raw_csv is None:
+        return {"exercicio": ano, "stage": stage, "raw_total": None, "portal_total": None, "diff_abs": None, "status": "RAW_NAO_ENCONTRADO"}, []
+
+    # RAW
+    df_raw = read_csv_any(raw_csv)
+    raw_total, raw_used, raw_removed = autodetect_sum_despesa(df_raw, stage)
+
+    # PORTAL snapshot
+    snap_csv = fetch_portal_csv(thread_session(retries, backoff), base_url, stage, ano, outdir, timeout, verbose)
+    df_portal = read_csv_any(snap_csv)
+    por_total, por_used, por_removed = autodetect_sum_despesa(df_portal, stage)
+
+    rec = {
+        "exercicio": ano,
+        "stage": stage,
+        "raw_file": str(raw_csv),
+        "portal_file": str(snap_csv),
+        "raw_total": raw_total,
+        "portal_total": por_total,
+        "diff_abs": None if (raw_total is None or por_total is None) else abs(por_total - raw_total),
+    }
+    cols = [
+        {"exercicio": ano, "stage": stage, "lado": "RAW",
+         "arquivo": str(raw_csv), "cols_usadas": ";".join(raw_used), "linhas_total_removidas": raw_removed},
+        {"exercicio": ano, "stage": stage, "lado": "PORTAL",
+         "arquivo": str(snap_csv), "cols_usadas": ";".join(por_used), "linhas_total_removidas": por_removed},
+    ]
+    # pausa por conexão: cada worker continua espaçando suas requisições ao portal
+    time.sleep(0.6)
+    return rec, cols
+
 def compare_despesas(years: List[int], stages: List[str], rawdir: Path, outdir: Path,
-                     base_url: str, timeout: int, retries: int, backoff: float, verbose: bool):
-    rows_recon: List[Dict] = []
-    cols_log: List[Dict] = []
+                     base_url: str, timeout: int, retries: int, backoff: float, verbose: bool,
+                     workers: int = 1):
     outdir.mkdir(parents=True, exist_ok=True)
 
-    with requests.Session() as sess:
-        for ano in years:
-            for stage in stages:
-                raw_csv = find_raw_csv_for_stage(rawdir, stage, ano)
-                if raw_csv is None:
-                    rows_recon.append({"exercicio": ano, "stage": stage, "raw_total": None, "portal_total": None, "diff_abs": None, "status": "RAW_NAO_ENCONTRADO"})
-                    continue
-
-                # RAW
-                df_raw = read_csv_any(raw_csv)
-                raw_total, raw_used, raw_removed = autodetect_sum_despesa(df_raw, stage)
-
-                # PORTAL snapshot
-                snap_csv = fetch_portal_csv(sess, base_url, stage, ano, outdir, timeout, retries, backoff, verbose)
-                df_portal = read_csv_any(snap_csv)
-                por_total, por_used, por_removed = autodetect_sum_despesa(df_portal, stage)
-
-                rows_recon.append({
-                    "exercicio": ano,
-                    "stage": stage,
-                    "raw_file": str(raw_csv),
-                    "portal_file": str(snap_csv),
-                    "raw_total": raw_total,
-                    "portal_total": por_total,
-                    "diff_abs": None if (raw_total is None or por_total is None) else abs(por_total - raw_total),
-                })
-
-                cols_log.append({
-                    "exercicio": ano, "stage": stage, "lado": "RAW",
-                    "arquivo": str(raw_csv), "cols_usadas": ";".join(raw_used), "linhas_total_removidas": raw_removed
-                })
-                cols_log.append({
-                    "exercicio": ano, "stage": stage, "lado": "PORTAL",
-                    "arquivo": str(snap_csv), "cols_usadas": ";".join(por_used), "linhas_total_removidas": por_removed
-                })
-
-                time.sleep(0.6)
+    # um (ano, stage) por tarefa; os downloads do portal correm em paralelo
+    tasks = [(ano, stage, rawdir, outdir, base_url, timeout, retries, backoff, verbose)
+             for ano in years for stage in stages]
+    results = run_tasks(reconcile_despesa, tasks, workers)
+    rows_recon: List[Dict] = [rec for rec, _ in results]
+    cols_log: List[Dict] = [c for _, cols in results for c in cols]
 
     df_rec = pd.DataFrame(rows_recon)
     df_cols = pd.DataFrame(cols_log)
@@ -631,43 +733,47 @@ def compare_despesas(years: List[int], stages: List[str], rawdir: Path, outdir:
     df_cols.to_csv(outdir / "D_columns_used.csv", index=False, encoding="utf-8")
     return df_rec, df_cols
 
+def reconcile_receita(ano: int, rawdir: Path, snaps_dir: Path,
+                      timeout: int, retries: int, backoff: float, entidades_arg: Optional[str],
+                      verbose: bool) -> Dict:
+    # RAW (saída do 03): raw/receitas/anexo10_prev_arrec_YYYY.csv
+    raw_csv = rawdir / "receitas" / f"anexo10_prev_arrec_{ano}.csv"
+    if not raw_csv.exists():
+        return {"exercicio": ano, "raw_csv": str(raw_csv), "status": "RAW_NAO_ENCONTRADO"}
+    df_raw = pd.read_csv(raw_csv, dtype={"ano":str,"codigo":str,"especificacao":str,"subitem":str}, encoding="utf-8")
+    # totals RAW
+    prev_raw = pd.to_numeric(df_raw["previsao"], errors="coerce").fillna(0).sum()
+    arr_raw  = pd.to_numeric(df_raw["arrecadacao"], errors="coerce").fillna(0).sum()
+
+    # PORTAL snapshot → PDF → parse
+    pdf_path = download_anexo10_pdf(ano, snaps_dir, timeout, retries, backoff, entidades_arg, verbose)
+    df_por = extract_anexo10_table(pdf_path, verbose=verbose)
+    # totals PORTAL
+    prev_por = pd.to_numeric(df_por["previsao"], errors="coerce").fillna(0).sum()
+    arr_por  = pd.to_numeric(df_por["arrecadacao"], errors="coerce").fillna(0).sum()
+
+    time.sleep(0.8)
+    return {
+        "exercicio": ano,
+        "raw_csv": str(raw_csv),
+        "portal_pdf": str(pdf_path),
+        "raw_previsao": float(prev_raw),
+        "portal_previsao": float(prev_por),
+        "diff_previsao": abs(float(prev_por) - float(prev_raw)),
+        "raw_arrecadacao": float(arr_raw),
+        "portal_arrecadacao": float(arr_por),
+        "diff_arrecadacao": abs(float(arr_por) - float(arr_raw)),
+        "status": "OK",
+    }
+
 def compare_receita(years: List[int], rawdir: Path, outdir: Path,
-                    timeout: int, retries: int, backoff: float, entidades_arg: Optional[str], verbose: bool):
-    rows: List[Dict] = []
+                    timeout: int, retries: int, backoff: float, entidades_arg: Optional[str], verbose: bool,
+                    workers: int = 1):
     snaps_dir = outdir / "raw_snapshots"
     snaps_dir.mkdir(parents=True, exist_ok=True)
 
-    for ano in years:
-        # RAW (saída do 03): raw/receitas/anexo10_prev_arrec_YYYY.csv
-        raw_csv = rawdir / "receitas" / f"anexo10_prev_arrec_{ano}.csv"
-        if not raw_csv.exists():
-            rows.append({"exercicio": ano, "raw_csv": str(raw_csv), "status": "RAW_NAO_ENCONTRADO"})
-            continue
-        df_raw = pd.read_csv(raw_csv, dtype={"ano":str,"codigo":str,"especificacao":str,"subitem":str}, encoding="utf-8")
-        # totals RAW
-        prev_raw = pd.to_numeric(df_raw["previsao"], errors="coerce").fillna(0).sum()
-        arr_raw  = pd.to_numeric(df_raw["arrecadacao"], errors="coerce").fillna(0).sum()
-
-        # PORTAL snapshot → PDF → parse
-        pdf_path = download_anexo10_pdf(ano, snaps_dir, timeout, retries, backoff, entidades_arg, verbose)
-        df_por = extract_anexo10_table(pdf_path, verbose=verbose)
-        # totals PORTAL
-        prev_por = pd.to_numeric(df_por["previsao"], errors="coerce").fillna(0).sum()
-        arr_por  = pd.to_numeric(df_por["arrecadacao"], errors="coerce").fillna(0).sum()
-
-        rows.append({
-            "exercicio": ano,
-            "raw_csv": str(raw_csv),
-            "portal_pdf": str(pdf_path),
-            "raw_previsao": float(prev_raw),
-            "portal_previsao": float(prev_por),
-            "diff_previsao": abs(float(prev_por) - float(prev_raw)),
-            "raw_arrecadacao": float(arr_raw),
-            "portal_arrecadacao": float(arr_por),
-            "diff_arrecadacao": abs(float(arr_por) - float(arr_raw)),
-            "status": "OK",
-        })
-        time.sleep(0.8)
+    tasks = [(ano, rawdir, snaps_dir, timeout, retries, backoff, entidades_arg, verbose) for ano in years]
+    rows: List[Dict] = run_tasks(reconcile_receita, tasks, workers)
 
     df = pd.DataFrame(rows)
     df.to_csv(outdir / "R_receita_reconcile.csv", index=False, encoding="utf-8")
@@ -685,6 +791,7 @@ def main():
     ap.add_argument("--timeout", type=int, default=90)
     ap.add_argument("--retries", type=int, default=3)
     ap.add_argument("--backoff", type=float, default=1.5)
+    ap.add_argument("--workers", type=int, default=4, help="Downloads simultâneos do portal (1 = serial; default: 4)")
     ap.add_argument("--verbose", action="store_true")
     args = ap.parse_args()
 
@@ -705,14 +812,14 @@ def main():
     # Despesas (01)
     df_d, df_cols = compare_despesas(
         years, stages, rawdir, outdir,
-        args.base_url, args.timeout, args.retries, args.backoff, args.verbose
+        args.base_url, args.timeout, args.retries, args.backoff, args.verbose, args.workers
     )
 
     # Receita (02+03)
     if args.include_receita:
         df_r = compare_receita(
             years, rawdir, outdir,
-            args.timeout, args.retries, args.backoff, args.entities, args.verbose
+            args.timeout, args.retries, args.backoff, args.entities, args.verbose, args.workers
         )
     else:
         df_r = pd.DataFrame()